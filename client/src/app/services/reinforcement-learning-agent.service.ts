@@ -1,8 +1,9 @@
+import {decodeReplay, REPLAY_MEDIA_TYPE} from '@services/replay-decoder';
 import {EpisodeSample} from '@models/http/episode-sample';
 import {AgentInfo} from '@models/http/agent-info';
 import {inject, Injectable} from '@angular/core';
 import {HttpClient} from '@angular/common/http';
-import {Observable} from 'rxjs';
+import {map, Observable} from 'rxjs';
 
 @Injectable({
   providedIn: 'root'
@@ -16,7 +17,10 @@ export class ReinforcementLearningAgentService {
   }
 
   getEpisode(agent: string, checkpoint: number = 0): Observable<EpisodeSample[]> {
-    return this.http.get<EpisodeSample[]>(`${this.apiUrl}/${agent}/${checkpoint}`);
+    return this.http.get(`${this.apiUrl}/${agent}/${checkpoint}`, {
+      headers: {Accept: REPLAY_MEDIA_TYPE},
+      responseType: 'arraybuffer'
+    }).pipe(map(decodeReplay));
   }
 
   getPlot(agent: string, plotIndex: number) {
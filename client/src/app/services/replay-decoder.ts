@@ -0,0 +1,96 @@
+import {EpisodeSample} from '@models/http/episode-sample';
+
+export const REPLAY_MEDIA_TYPE = 'application/x-pacman-replay';
+
+const REPLAY_MAGIC = 'PMRP';
+const REPLAY_VERSION = 2;
+// Version 1 had no position width byte; its positions are always int8
+const HEADER_SIZE_V1 = 20;
+const HEADER_SIZE = 21;
+
+// Decodes the columnar replay written by server/replay_codec.py into the same
+// samples the JSON endpoint returns. All values are little-endian.
+export function decodeReplay(buffer: ArrayBuffer): EpisodeSample[] {
+  const view = new DataView(buffer);
+
+  const magic = String.fromCharCode(...new Uint8Array(buffer, 0, 4));
+  const version = view.getUint8(4);
+  if (magic !== REPLAY_MAGIC || (version !== 1 && version !== REPLAY_VERSION)) {
+    throw new Error(`Not a version 1 or ${REPLAY_VERSION} replay`);
+  }
+
+  const v1 = version === 1;
+  const field = v1 ? 6 : 7;
+  const ghostCount = view.getUint8(5);
+  const positionWidth = v1 ? 1 : view.getUint8(6);
+  const timeWidth = view.getUint8(field);
+  const scoreWidth = view.getUint8(field + 1);
+  const frames = view.getUint32(field + 2, true);
+  let timestamp = view.getInt32(field + 6, true);
+  let score = view.getInt32(field + 10, true);
+
+  let offset = v1 ? HEADER_SIZE_V1 : HEADER_SIZE;
+  const bytes = (count: number): Uint8Array => {
+    const column = new Uint8Array(buffer, offset, count);
+    offset += count;
+    return column;
+  };
+  // Positions are int8, int16 or int32; DataView reads them at any alignment
+  const positions = (count: number): number[] => {
+    const values: number[] = [];
+    for (let i = 0; i < count; i++, offset += positionWidth) {
+      values.push(
+        positionWidth === 1 ? view.getInt8(offset)
+          : positionWidth === 2 ? view.getInt16(offset, true) : view.getInt32(offset, true)
+      );
+    }
+    return values;
+  };
+
+  const types = bytes(ghostCount);
+  const pacmanX = positions(frames);
+  const pacmanY = positions(frames);
+  const ghostX = positions(frames * ghostCount);
+  const ghostY = positions(frames * ghostCount);
+  const states = bytes(frames);
+  const gameOver = bytes(Math.ceil(frames / 8));
+
+  const deltas = (width: number): number[] => {
+    const values: number[] = [];
+    for (let i = 0; i < frames - 1; i++, offset += width) {
+      values.push(width === 2 ? view.getInt16(offset, true) : view.getInt32(offset, true));
+    }
+    return values;
+  };
+  const timeDeltas = deltas(timeWidth);
+  const scoreDeltas = deltas(scoreWidth);
+
+  const samples: EpisodeSample[] = [];
+  for (let i = 0; i < frames; i++) {
+    if (i > 0) {
+      timestamp += timeDeltas[i - 1];
+      score += scoreDeltas[i - 1];
+    }
+
+    const ghosts = [];
+    for (let j = 0; j < ghostCount; j++) {
+      ghosts.push({
+        x: ghostX[i * ghostCount + j],
+        y: ghostY[i * ghostCount + j],
+        type: types[j],
+        state: (states[i] >> (2 * j)) & 3,
+      });
+    }
+
+    samples.push({
+      pacman: {x: pacmanX[i], y: pacmanY[i]},
+      ghosts,
+      game_over: ((gameOver[i >> 3] >> (i & 7)) & 1) === 1,
+      timestamp,
+      lives: 0, // not recorded by the server, as in the JSON episodes
+      score,
+    });
+  }
+
+  return samples;
+}
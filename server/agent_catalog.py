@@ -0,0 +1,163 @@
+from checkpoint_manifest import CheckpointManifest, CHECKPOINT_PATTERN, MANIFEST_NAME
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import threading
+import json
+import os
+
+# Without a manifest, only every CHECKPOINT_STEP-th checkpoint is exposed
+CHECKPOINT_STEP = 20
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+@dataclass
+class ModelEntry:
+    algo: str
+    model: str
+    path: str
+    signature: tuple
+    checkpoint_files: List[str] = field(default_factory=list)
+    checkpoint_step: int = CHECKPOINT_STEP
+    special_files: List[str] = field(default_factory=list)
+    plot_files: Optional[List[str]] = None
+    description: object = ""
+
+    @property
+    def checkpoint_count(self) -> int:
+        return (len(self.checkpoint_files) + self.checkpoint_step - 1) // self.checkpoint_step
+
+    @property
+    def total_files(self) -> int:
+        return len(self.special_files) + self.checkpoint_count
+
+    @property
+    def best_model_path(self) -> Optional[str]:
+        return next((f for f in self.special_files if f.endswith("best_model.zip")), None)
+
+    def resolve_checkpoint(self, checkpoint: int) -> Optional[str]:
+        if 0 <= checkpoint < self.checkpoint_count:
+            return self.checkpoint_files[min(checkpoint * self.checkpoint_step, len(self.checkpoint_files) - 1)]
+
+        special_index = checkpoint - self.checkpoint_count
+        if 0 <= special_index < len(self.special_files):
+            return self.special_files[special_index]
+
+        return None
+
+class AgentCatalog:
+    """
+    In-memory index of agents/<algo>/<model>: sorted checkpoints, special files, plots
+    and descriptions. Checkpoints come from checkpoints/manifest.json when there is one,
+    else from a directory scan. An entry is only rebuilt when the mtime of its model,
+    checkpoints or plots directory, or of its manifest or description file, changes.
+    """
+
+    def __init__(self, root: str = "agents"):
+        self.root = root
+
+        self._entries: Dict[Tuple[str, str], ModelEntry] = {}
+        self._listing: Dict[str, Tuple[Optional[int], List[str]]] = {}
+        self._lock = threading.Lock()
+
+    def models(self) -> List[ModelEntry]:
+        entries = []
+
+        for algo in self._list_dir(self.root):
+            if not os.path.isdir(os.path.join(self.root, algo)):
+                continue
+
+            for model in self._list_dir(os.path.join(self.root, algo)):
+                entry = self.get(algo, model)
+                if entry is not None:
+                    entries.append(entry)
+
+        return entries
+
+    def get(self, algo: str, model: str) -> Optional[ModelEntry]:
+        path = os.path.join(self.root, algo, model)
+        signature = self._signature(path)
+
+        if signature[0] is None or not os.path.isdir(path):
+            with self._lock:
+                self._entries.pop((algo, model), None)
+            return None
+
+        with self._lock:
+            entry = self._entries.get((algo, model))
+        if entry is not None and entry.signature == signature:
+            return entry
+
+        entry = self._build_entry(algo, model, path, signature)
+        with self._lock:
+            self._entries[(algo, model)] = entry
+
+        return entry
+
+    def _list_dir(self, path: str) -> List[str]:
+        mtime = _mtime(path)
+        if mtime is None:
+            return []
+
+        with self._lock:
+            cached = self._listing.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        names = sorted(os.listdir(path))
+        with self._lock:
+            self._listing[path] = (mtime, names)
+
+        return names
+
+    @staticmethod
+    def _signature(path: str) -> tuple:
+        return (
+            _mtime(path),
+            _mtime(os.path.join(path, "checkpoints")),
+            _mtime(os.path.join(path, "checkpoints", MANIFEST_NAME)),
+            _mtime(os.path.join(path, "plots")),
+            _mtime(os.path.join(path, "description.json")),
+        )
+
+    def _build_entry(self, algo: str, model: str, path: str, signature: tuple) -> ModelEntry:
+        entry = ModelEntry(algo, model, path, signature)
+
+        # A manifest lists the retained checkpoints, already thinned, in one read
+        ckpt_path = os.path.join(path, "checkpoints")
+        manifest = CheckpointManifest.load(ckpt_path)
+        if manifest is not None:
+            entry.checkpoint_files = [os.path.join(ckpt_path, record.file) for record in manifest.records]
+            entry.checkpoint_step = 1
+        elif os.path.isdir(ckpt_path):
+            checkpoints = []
+            for filename in os.listdir(ckpt_path):
+                match = CHECKPOINT_PATTERN.match(filename)
+                if match:
+                    checkpoints.append((int(match.group(1)), os.path.join(ckpt_path, filename)))
+
+            checkpoints.sort(key=lambda x: x[0])
+            entry.checkpoint_files = [file_path for _, file_path in checkpoints]
+
+        for special in (f"{model}.zip", "best_model.zip"):
+            special_path = os.path.join(path, special)
+            if os.path.exists(special_path):
+                entry.special_files.append(special_path)
+
+        plots_path = os.path.join(path, "plots")
+        if os.path.isdir(plots_path):
+            entry.plot_files = sorted(f for f in os.listdir(plots_path) if f.endswith(".png"))
+
+        description_path = os.path.join(path, "description.json")
+        if os.path.exists(description_path):
+            with open(description_path, 'r') as f:
+                try:
+                    entry.description = json.load(f)
+                except json.JSONDecodeError:
+                    entry.description = ""
+
+        return entry
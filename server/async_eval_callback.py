@@ -0,0 +1,179 @@
+from stable_baselines3.common.base_class import BaseAlgorithm
+from stable_baselines3.common.callbacks import BaseCallback
+from pacman_player import play_episodes
+from typing import Dict, Optional, Type
+
+import multiprocessing
+import numpy as np
+import queue
+import torch
+import io
+import os
+
+def _write_atomic(path: str, data: bytes):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _eval_worker(algo_class: Type[BaseAlgorithm], model_bytes: bytes, requests, results, n_eval_episodes: int,
+                 seed: int, best_model_save_path: Optional[str], log_path: Optional[str]):
+    # The learner has the other cores; a single thread is plenty for batched inference
+    torch.set_num_threads(1)
+    model = algo_class.load(io.BytesIO(model_bytes), device="cpu")
+
+    best_mean_reward = -np.inf
+    evaluations_timesteps, evaluations_results, evaluations_length = [], [], []
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+
+        num_timesteps, weights = request
+        model.policy.load_state_dict({name: torch.as_tensor(value) for name, value in weights.items()})
+
+        episodes = [info['episode'] for info in play_episodes(model, n_eval_episodes, seed)]
+        episode_rewards = [episode['r'] for episode in episodes]
+        episode_lengths = [episode['l'] for episode in episodes]
+
+        evaluations_timesteps.append(num_timesteps)
+        evaluations_results.append(episode_rewards)
+        evaluations_length.append(episode_lengths)
+
+        if log_path is not None:
+            buffer = io.BytesIO()
+            np.savez(buffer, timesteps=evaluations_timesteps, results=evaluations_results, ep_lengths=evaluations_length)
+            _write_atomic(log_path + ".npz", buffer.getvalue())
+
+        mean_reward = float(np.mean(episode_rewards))
+        new_best = mean_reward > best_mean_reward
+        if new_best:
+            best_mean_reward = mean_reward
+            if best_model_save_path is not None:
+                buffer = io.BytesIO()
+                model.save(buffer)
+                _write_atomic(os.path.join(best_model_save_path, "best_model.zip"), buffer.getvalue())
+
+        results.put({
+            'timesteps': num_timesteps,
+            'mean_reward': mean_reward,
+            'std_reward': float(np.std(episode_rewards)),
+            'mean_ep_length': float(np.mean(episode_lengths)),
+            'std_ep_length': float(np.std(episode_lengths)),
+            'new_best': new_best,
+        })
+
+class AsyncEvalCallback(BaseCallback):
+    """
+    EvalCallback counterpart that never blocks the learner. Every `eval_freq` calls the
+    policy weights are copied to a worker process, which plays `n_eval_episodes` seeded
+    episodes in lockstep on a BatchedPacmanEnv, then writes evaluations.npz and
+    best_model.zip itself. While the worker is busy, only the latest snapshot is kept
+    waiting; results are logged by the learner as they come back.
+
+    `last_mean_reward` therefore lags: it scores weights from at least one `eval_freq`
+    before the current step, and stays -inf until the first result arrives.
+    """
+
+    def __init__(self, eval_freq: int = 10_000, n_eval_episodes: int = 5, seed: int = 0,
+                 best_model_save_path: Optional[str] = None, log_path: Optional[str] = None, verbose: int = 1):
+        super().__init__(verbose)
+        self.eval_freq = eval_freq
+        self.n_eval_episodes = n_eval_episodes
+        self.seed = seed
+        self.best_model_save_path = best_model_save_path
+        self.log_path = os.path.join(log_path, "evaluations") if log_path is not None else None
+
+        self.best_mean_reward = -np.inf
+        self.last_mean_reward = -np.inf
+        self.skipped_evaluations = 0
+
+        self._process = None
+        self._requests = None
+        self._results = None
+
+    def _init_callback(self) -> None:
+        for path in (self.best_model_save_path, self.log_path and os.path.dirname(self.log_path)):
+            if path:
+                os.makedirs(path, exist_ok=True)
+
+        # The worker rebuilds the algorithm once from a bare save (no replay buffer), then only gets weights
+        model_bytes = io.BytesIO()
+        self.model.save(model_bytes)
+
+        context = multiprocessing.get_context("spawn")
+        self._requests = context.Queue(maxsize=1)
+        self._results = context.Queue()
+        self._process = context.Process(
+            target=_eval_worker,
+            args=(
+                type(self.model), model_bytes.getvalue(), self._requests, self._results, self.n_eval_episodes,
+                self.seed, self.best_model_save_path, self.log_path
+            ),
+            daemon=True,
+        )
+        self._process.start()
+
+    def _snapshot(self) -> Dict[str, np.ndarray]:
+        return {name: value.detach().cpu().numpy().copy() for name, value in self.model.policy.state_dict().items()}
+
+    def _on_step(self) -> bool:
+        self._collect_results()
+        if not self._process.is_alive():
+            # A snapshot still being fed to the dead worker would otherwise block interpreter exit
+            self._requests.cancel_join_thread()
+            raise RuntimeError(f"Evaluation worker exited with code {self._process.exitcode}")
+
+        if self.eval_freq > 0 and self.n_calls % self.eval_freq == 0:
+            # Replace a snapshot the worker has not picked up yet rather than queueing behind it
+            try:
+                self._requests.get_nowait()
+                self.skipped_evaluations += 1
+            except queue.Empty:
+                pass
+
+            try:
+                self._requests.put_nowait((self.num_timesteps, self._snapshot()))
+            except queue.Full:
+                self.skipped_evaluations += 1
+
+        return True
+
+    def _collect_results(self):
+        while True:
+            try:
+                self._record(self._results.get_nowait())
+            except queue.Empty:
+                return
+
+    def _record(self, result: dict):
+        self.last_mean_reward = result['mean_reward']
+        if result['new_best']:
+            self.best_mean_reward = result['mean_reward']
+
+        if self.verbose >= 1:
+            print(
+                f"Eval num_timesteps={result['timesteps']}, "
+                f"episode_reward={result['mean_reward']:.2f} +/- {result['std_reward']:.2f}"
+            )
+            print(f"Episode length: {result['mean_ep_length']:.2f} +/- {result['std_ep_length']:.2f}")
+            if result['new_best']:
+                print("New best mean reward!")
+
+        self.logger.record("eval/mean_reward", result['mean_reward'])
+        self.logger.record("eval/mean_ep_length", result['mean_ep_length'])
+        self.logger.record("eval/timesteps", result['timesteps'])
+        self.logger.record("eval/skipped", self.skipped_evaluations)
+
+    def _on_training_end(self) -> None:
+        # Let the worker finish what it has, so the last best_model.zip is on disk when learn() returns
+        if self._process.is_alive():
+            self._requests.put(None)
+        while self._process.is_alive() or not self._results.empty():
+            try:
+                self._record(self._results.get(timeout=1))
+            except queue.Empty:
+                pass
+
+        self._process.join()
@@ -0,0 +1,613 @@
+from models.characters.ghost import GhostType, GhostState, SCATTER_CHASE_CYCLE, RESPAWN_POINTS, RESPAWN_DURATIONS
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv, VecEnvIndices, VecEnvStepReturn
+from pacman_constants import GAME_MAP, DIRECTION_MAP, OBSERVATION_FIELDS
+from models.map.topology import STILL
+from models.map.path_table import PathTable
+from models.random_stream import RandomStreams
+from models.map.dot_index import DotLayout
+from models.map.game_map import GameMap
+from models.interfaces import CellType
+from typing import Any, List, Optional
+
+from gymnasium import spaces
+
+import gymnasium as gym
+import numpy as np
+import time
+
+PACMAN_START = (9, 15)
+
+# Same order as PacmanEnv.ghosts
+GHOST_STARTS = [
+    (GhostType.BLINKY, 9, 8),
+    (GhostType.CLYDE, 8, 9),
+    (GhostType.INKY, 10, 9),
+    (GhostType.PINKY, 9, 9),
+]
+
+MOVE_INTERVAL = 225
+MAX_STEPS = 10000
+
+# Nearest-dot candidates scanned first in each cell's precomputed distance order
+NEAREST_DOTS_PREFIX = 16
+
+FRIGHTENED = GhostState.FRIGHTENED.value
+SCATTER = GhostState.SCATTER.value
+CHASE = GhostState.CHASE.value
+
+# Direction index -> delta, with STILL as a zero move
+DX = np.array([d.x for d in DIRECTION_MAP] + [0])
+DY = np.array([d.y for d in DIRECTION_MAP] + [0])
+
+# For a 4-bit move mask: number of set bits, and the i-th set bit (in DIRECTION_MAP order)
+POPCOUNT = np.array([bin(mask).count('1') for mask in range(16)])
+NTH_MOVE = np.full((16, 4), STILL, dtype=np.int64)
+for _mask in range(16):
+    for _i, _d in enumerate([d for d in range(4) if _mask >> d & 1]):
+        NTH_MOVE[_mask, _i] = _d
+
+class BatchedPacmanEnv(VecEnv):
+    """
+    N Pac-Man games stepped together as structure-of-arrays numpy state.
+
+    Follows PacmanEnv's rules step for step (ghost targeting, door locking, teleports,
+    collisions, rewards and the flat observation layout) and resets finished games
+    automatically, like SB3's DummyVecEnv with a Monitor wrapper. Each game has its own
+    random stream, so with seed s game i plays exactly like a PacmanEnv reset with seed s + i.
+    """
+
+    def __init__(self, num_envs: int = 256, seed: Optional[int] = None):
+        self.render_mode = None
+
+        self.game_map = GameMap(GAME_MAP)
+        self.width, self.height = self.game_map.width, self.game_map.height
+
+        self.path_table = PathTable.for_map(self.game_map)
+        self.path_table.fill()
+
+        self._build_static_tables()
+
+        self.observation_size = sum(int(np.prod(shape)) for _, shape in OBSERVATION_FIELDS)
+        observation_space = spaces.Box(
+            low=-float('inf'),
+            high=float('inf'),
+            shape=(self.observation_size,),
+            dtype=np.float32
+        )
+
+        super().__init__(num_envs, observation_space, spaces.Discrete(4))
+
+        # Game i draws like a PacmanEnv reset with seed + i
+        if seed is None:
+            rngs = [np.random.default_rng(s) for s in np.random.SeedSequence().spawn(num_envs)]
+        else:
+            rngs = [np.random.default_rng(seed + i) for i in range(num_envs)]
+        self.random_streams = RandomStreams(rngs)
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+        self._obs = np.zeros((num_envs, self.observation_size), dtype=np.float32)
+        self._start_time = time.time()
+
+        n, g = num_envs, len(GHOST_STARTS)
+
+        self.current_time = np.zeros(n, dtype=np.int64)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.ghost_streak = np.zeros(n, dtype=np.int64)
+        self.dots_alive = np.zeros((n, self.num_dots), dtype=bool)
+
+        self.episode_rewards = np.zeros(n, dtype=np.float64)
+        self.episode_lengths = np.zeros(n, dtype=np.int64)
+
+        self.pacman_x = np.zeros(n, dtype=np.int64)
+        self.pacman_y = np.zeros(n, dtype=np.int64)
+        self.pacman_direction = np.zeros(n, dtype=np.int64)
+        self.pacman_move_time = np.zeros(n, dtype=np.int64)
+
+        self.ghost_x = np.zeros((n, g), dtype=np.int64)
+        self.ghost_y = np.zeros((n, g), dtype=np.int64)
+        self.ghost_direction = np.zeros((n, g), dtype=np.int64)
+        self.ghost_state = np.zeros((n, g), dtype=np.int64)
+        self.ghost_previous_state = np.zeros((n, g), dtype=np.int64)
+        self.ghost_move_interval = np.zeros((n, g), dtype=np.float64)
+        self.ghost_move_time = np.zeros((n, g), dtype=np.int64)
+        self.ghost_state_change = np.zeros((n, g), dtype=np.int64)
+        self.ghost_cycle_index = np.zeros((n, g), dtype=np.int64)
+        self.ghost_respawn_start = np.zeros((n, g), dtype=np.int64)
+        self.ghost_respawn_duration = np.zeros((n, g), dtype=np.int64)
+        self.ghost_door_locked = np.zeros((n, g), dtype=bool)
+
+        self._reset_games(np.arange(n))
+
+    def _build_static_tables(self):
+        game_map = self.game_map
+
+        self.topology = game_map.topology
+        self.pacman_walkable = self.topology.walkable[0]
+        self.teleport_points = self.topology.teleport_points[:2]
+
+        self.dot_layout = DotLayout.for_map(game_map)
+        self.num_dots = len(self.dot_layout.dots)
+        self.dot_x, self.dot_y = self.dot_layout.x, self.dot_layout.y
+        self.dot_is_pellet = self.dot_layout.is_pellet
+        self.dot_at = self.dot_layout.index_at
+
+        self.ghost_types = np.array([ghost_type.value for ghost_type, _, _ in GHOST_STARTS])
+        self.ghost_start_x = np.array([x for _, x, _ in GHOST_STARTS])
+        self.ghost_start_y = np.array([y for _, _, y in GHOST_STARTS])
+        self.respawn_x = np.array([RESPAWN_POINTS[ghost_type][0] for ghost_type, _, _ in GHOST_STARTS])
+        self.respawn_y = np.array([RESPAWN_POINTS[ghost_type][1] for ghost_type, _, _ in GHOST_STARTS])
+        self.respawn_duration = np.array([RESPAWN_DURATIONS[ghost_type] for ghost_type, _, _ in GHOST_STARTS])
+        self.scatter_chase_cycle = np.array(SCATTER_CHASE_CYCLE)
+
+        scatter_targets = {
+            GhostType.INKY: (self.width - 1, self.height - 1),
+            GhostType.BLINKY: (self.width - 1, 0),
+            GhostType.CLYDE: (0, self.height - 1),
+            GhostType.PINKY: (0, 0)
+        }
+        self.scatter_x = np.array([scatter_targets[ghost_type][0] for ghost_type, _, _ in GHOST_STARTS])
+        self.scatter_y = np.array([scatter_targets[ghost_type][1] for ghost_type, _, _ in GHOST_STARTS])
+        self.ghost_column = {ghost_type: i for i, (ghost_type, _, _) in enumerate(GHOST_STARTS)}
+
+        # A ghost leaving the door locks it unless it steps back into the ghost house
+        self.door_exit_locks = np.zeros((self.width * self.height, STILL + 1), dtype=bool)
+        for y, x in zip(*np.nonzero(game_map.cell_mask(CellType.Door))):
+            for heading in range(STILL + 1):
+                next_cell = game_map.get_cell(x + DX[heading], y + DY[heading])
+                self.door_exit_locks[y * self.width + x, heading] = next_cell != CellType.GhostCell
+
+    def _reset_games(self, idx: np.ndarray, level_only: bool = False):
+        self.pacman_x[idx], self.pacman_y[idx] = PACMAN_START
+        self.pacman_direction[idx] = STILL
+        self.pacman_move_time[idx] = 0
+
+        self.ghost_x[idx] = self.ghost_start_x
+        self.ghost_y[idx] = self.ghost_start_y
+        self.ghost_direction[idx] = STILL
+        self.ghost_state[idx] = SCATTER
+        self.ghost_previous_state[idx] = SCATTER
+        self.ghost_move_interval[idx] = MOVE_INTERVAL * 1.3
+        self.ghost_move_time[idx] = 0
+        self.ghost_state_change[idx] = 0
+        self.ghost_cycle_index[idx] = 0
+        self.ghost_respawn_start[idx] = 0
+        self.ghost_respawn_duration[idx] = 0
+        self.ghost_door_locked[idx] = False
+
+        self.dots_alive[idx] = True
+
+        # Completing a level only rebuilds the maze and characters
+        if level_only:
+            return
+
+        self.current_time[idx] = 0
+        self.score[idx] = 0
+        self.ghost_streak[idx] = 200
+        self.episode_rewards[idx] = 0
+        self.episode_lengths[idx] = 0
+
+    def reset(self) -> np.ndarray:
+        seeded = [i for i, seed in enumerate(self._seeds) if seed is not None]
+        self.random_streams.reseed(np.array(seeded, dtype=np.int64), [self._seeds[i] for i in seeded])
+        self._reset_seeds()
+        self._reset_options()
+
+        idx = np.arange(self.num_envs)
+        self._reset_games(idx)
+        self._obs[:] = self._get_obs(idx)
+
+        return self._obs.copy()
+
+    def step_async(self, actions: np.ndarray):
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        prev_pacman_x, prev_pacman_y = self.pacman_x.copy(), self.pacman_y.copy()
+        prev_ghost_x, prev_ghost_y = self.ghost_x.copy(), self.ghost_y.copy()
+        old_score = self.score.copy()
+
+        self.current_time += MOVE_INTERVAL
+
+        self._update_ghosts(prev_pacman_x, prev_pacman_y, prev_ghost_x, prev_ghost_y)
+        self._update_pacman(self._actions)
+
+        self._check_dot_collision()
+        game_over = self._check_ghost_collision(prev_pacman_x, prev_pacman_y, prev_ghost_x, prev_ghost_y)
+
+        level_completed = ~self.dots_alive.any(axis=1)
+        terminated = game_over | level_completed
+        truncated = self.current_time // MOVE_INTERVAL > MAX_STEPS
+
+        if level_completed.any():
+            completed = np.flatnonzero(level_completed)
+            self._reset_games(completed, level_only=True)
+            prev_pacman_x[completed], prev_pacman_y[completed] = PACMAN_START
+
+        rewards = self._calculate_reward(old_score, prev_pacman_x, prev_pacman_y)
+
+        all_envs = np.arange(self.num_envs)
+        self._obs[:] = self._get_obs(all_envs)
+
+        self.episode_rewards += rewards
+        self.episode_lengths += 1
+
+        dones = terminated | truncated
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+
+        if dones.any():
+            finished = np.flatnonzero(dones)
+            for i in finished:
+                infos[i] = {
+                    'terminal_observation': self._obs[i].copy(),
+                    'TimeLimit.truncated': bool(truncated[i] and not terminated[i]),
+                    'score': int(self.score[i]),
+                    'episode': {
+                        'r': round(float(self.episode_rewards[i]), 6),
+                        'l': int(self.episode_lengths[i]),
+                        't': round(time.time() - self._start_time, 6),
+                    },
+                }
+
+            self._reset_games(finished)
+            self._obs[finished] = self._get_obs(finished)
+
+        return self._obs.copy(), rewards.astype(np.float32), dones, infos
+
+    def _walkable(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        # Pac-Man's walkability: no door access, off-grid cells are not walls
+        inside = (0 <= x) & (x < self.width) & (0 <= y) & (y < self.height)
+        cells = self.pacman_walkable[np.clip(y, 0, self.height - 1), np.clip(x, 0, self.width - 1)]
+        return ~inside | cells
+
+    def _random_moves(self, games: np.ndarray, masks: np.ndarray) -> np.ndarray:
+        # Like Ghost._get_valid_random_direction: no draw when there is nowhere to go
+        counts = POPCOUNT[masks]
+        moves = np.full(len(games), STILL, dtype=np.int64)
+
+        drawing = np.flatnonzero(counts > 0)
+        picks = (self.random_streams.random(games[drawing]) * counts[drawing]).astype(np.int64)
+        moves[drawing] = NTH_MOVE[masks[drawing], picks]
+
+        return moves
+
+    def _update_ghosts(self, pacman_x, pacman_y, prev_ghost_x, prev_ghost_y):
+        table = self.path_table
+        topology = self.topology
+        t = self.current_time[:, None]
+
+        active = t - self.ghost_move_time >= self.ghost_move_interval
+
+        # Scatter/chase cycle and leaving the frightened state
+        since_last_change = t - self.ghost_state_change
+        frightened = self.ghost_state == FRIGHTENED
+
+        calm_down = active & frightened & (since_last_change > 7000)
+        switch = active & ~frightened & (since_last_change > self.scatter_chase_cycle[self.ghost_cycle_index])
+
+        self.ghost_previous_state = np.where(switch, self.ghost_state, self.ghost_previous_state)
+        self.ghost_state = np.where(
+            calm_down, self.ghost_previous_state,
+            np.where(switch, np.where(self.ghost_state == CHASE, SCATTER, CHASE), self.ghost_state)
+        )
+        self.ghost_cycle_index = np.where(
+            switch, np.minimum(self.ghost_cycle_index + 1, len(SCATTER_CHASE_CYCLE) - 1), self.ghost_cycle_index
+        )
+        self.ghost_state_change = np.where(calm_down | switch, t, self.ghost_state_change)
+
+        # Speed
+        frightened = self.ghost_state == FRIGHTENED
+        speed_increase = np.minimum(np.floor(t / 10000) * 0.05, 0.15)
+        interval = np.where(frightened, MOVE_INTERVAL * 1.3 * 0.8, MOVE_INTERVAL * np.maximum(1.3 - speed_increase, 1.15))
+        self.ghost_move_interval = np.where(active, interval, self.ghost_move_interval)
+
+        # Door locking
+        cell = self.ghost_y * self.width + self.ghost_x
+        exit_lock = active & ~self.ghost_door_locked & self.door_exit_locks[cell, self.ghost_direction]
+        locked = self.ghost_door_locked | exit_lock
+        unlock = active & locked & (t >= self.ghost_respawn_start + self.ghost_respawn_duration)
+        self.ghost_door_locked = locked & ~unlock
+
+        # Targets: chase targets use the positions from the start of the step
+        target_x = np.broadcast_to(self.scatter_x, cell.shape).copy()
+        target_y = np.broadcast_to(self.scatter_y, cell.shape).copy()
+
+        chase_x, chase_y = target_x.copy(), target_y.copy()
+        blinky = self.ghost_column[GhostType.BLINKY]
+        pinky = self.ghost_column[GhostType.PINKY]
+        inky = self.ghost_column[GhostType.INKY]
+        clyde = self.ghost_column[GhostType.CLYDE]
+
+        chase_x[:, blinky], chase_y[:, blinky] = pacman_x, pacman_y
+        chase_x[:, pinky], chase_y[:, pinky] = pacman_x + 4, pacman_y
+        chase_x[:, inky] = 2 * pacman_x - prev_ghost_x[:, blinky]
+        chase_y[:, inky] = 2 * pacman_y - prev_ghost_y[:, blinky]
+
+        clyde_far = (prev_ghost_x[:, clyde] - pacman_x) ** 2 + (prev_ghost_y[:, clyde] - pacman_y) ** 2 > 64
+        chase_x[:, clyde] = np.where(clyde_far, pacman_x, chase_x[:, clyde])
+        chase_y[:, clyde] = np.where(clyde_far, pacman_y, chase_y[:, clyde])
+
+        chasing = self.ghost_state == CHASE
+        target_x = np.clip(np.where(chasing, chase_x, target_x), 0, self.width - 1)
+        target_y = np.clip(np.where(chasing, chase_y, target_y), 0, self.height - 1)
+
+        # Movement
+        door = (~self.ghost_door_locked).astype(np.int64)
+        heading = self.ghost_direction
+
+        hop = table.next_hop[door, cell, heading, target_y * self.width + target_x].astype(np.int64)
+        wander = active & (frightened | (hop < 0))
+        wander_moves = topology.ghost_moves[door, cell, heading]
+
+        open_moves = topology.ghost_moves[door, cell, STILL]
+        can_stay = topology.ghost_can_stay[door, cell]
+
+        # Ghost by ghost, so each game draws from its stream in PacmanEnv's order
+        direction = hop.copy()
+        for column in range(direction.shape[1]):
+            games = np.flatnonzero(wander[:, column])
+            direction[games, column] = self._random_moves(games, wander_moves[games, column])
+
+            valid = np.where(
+                direction[:, column] < STILL, open_moves[:, column] >> np.minimum(direction[:, column], 3) & 1, can_stay[:, column]
+            ).astype(bool)
+            games = np.flatnonzero(active[:, column] & ~valid)
+            direction[games, column] = self._random_moves(
+                games, topology.ghost_moves[door[games, column], cell[games, column], direction[games, column]]
+            )
+
+        can_move = np.where(direction < STILL, open_moves >> np.minimum(direction, 3) & 1, can_stay).astype(bool)
+        moving = active & can_move
+
+        self.ghost_direction = np.where(active, direction, self.ghost_direction)
+        self.ghost_x = np.where(moving, self.ghost_x + DX[direction], self.ghost_x)
+        self.ghost_y = np.where(moving, self.ghost_y + DY[direction], self.ghost_y)
+        self.ghost_move_time = np.where(moving, t, self.ghost_move_time)
+
+    def _update_pacman(self, actions: np.ndarray):
+        t = self.current_time
+        can_move = t - self.pacman_move_time >= MOVE_INTERVAL
+
+        turn_open = self._walkable(self.pacman_x + DX[actions], self.pacman_y + DY[actions])
+        self.pacman_direction = np.where(can_move & turn_open, actions, self.pacman_direction)
+        blocked = can_move & ~turn_open
+
+        if len(self.teleport_points) >= 2:
+            (ax, ay), (bx, by) = self.teleport_points
+            at_a = blocked & (self.pacman_x == ax) & (self.pacman_y == ay)
+            at_b = blocked & ~at_a & (self.pacman_x == bx) & (self.pacman_y == by)
+            teleported = at_a | at_b
+
+            self.pacman_x = np.where(at_a, bx, np.where(at_b, ax, self.pacman_x))
+            self.pacman_y = np.where(at_a, by, np.where(at_b, ay, self.pacman_y))
+            self.pacman_move_time = np.where(teleported, t + 250, self.pacman_move_time)
+            can_move &= ~teleported
+        else:
+            can_move &= ~blocked
+
+        next_x = self.pacman_x + DX[self.pacman_direction]
+        next_y = self.pacman_y + DY[self.pacman_direction]
+        moving = can_move & self._walkable(next_x, next_y)
+
+        self.pacman_x = np.where(moving, next_x, self.pacman_x)
+        self.pacman_y = np.where(moving, next_y, self.pacman_y)
+        self.pacman_move_time = np.where(moving, t, self.pacman_move_time)
+
+    def _check_dot_collision(self):
+        inside = (0 <= self.pacman_x) & (self.pacman_x < self.width) & (0 <= self.pacman_y) & (self.pacman_y < self.height)
+        dot = np.where(
+            inside,
+            self.dot_at[np.clip(self.pacman_y, 0, self.height - 1), np.clip(self.pacman_x, 0, self.width - 1)],
+            -1
+        )
+
+        rows = np.flatnonzero(dot >= 0)
+        rows = rows[self.dots_alive[rows, dot[rows]]]
+        if not len(rows):
+            return
+
+        eaten = dot[rows]
+        pellet = self.dot_is_pellet[eaten]
+
+        self.score[rows] += np.where(pellet, 50, 10)
+        self.dots_alive[rows, eaten] = False
+
+        pellet_rows = rows[pellet]
+        if len(pellet_rows):
+            self.ghost_streak[pellet_rows] = 200
+
+            calm = self.ghost_state[pellet_rows] != FRIGHTENED
+            t = self.current_time[pellet_rows, None]
+            self.ghost_previous_state[pellet_rows] = np.where(calm, self.ghost_state[pellet_rows], self.ghost_previous_state[pellet_rows])
+            self.ghost_state_change[pellet_rows] = np.where(calm, t, self.ghost_state_change[pellet_rows])
+            self.ghost_state[pellet_rows] = FRIGHTENED
+
+    def _check_ghost_collision(self, prev_pacman_x, prev_pacman_y, prev_ghost_x, prev_ghost_y) -> np.ndarray:
+        game_over = np.zeros(self.num_envs, dtype=bool)
+
+        # Ghosts are resolved in order, as the streak doubles with every ghost eaten
+        for i in range(len(GHOST_STARTS)):
+            same_cell = (self.pacman_x == self.ghost_x[:, i]) & (self.pacman_y == self.ghost_y[:, i])
+            swapped = (
+                (self.pacman_x == prev_ghost_x[:, i]) & (self.pacman_y == prev_ghost_y[:, i]) &
+                (prev_pacman_x == self.ghost_x[:, i]) & (prev_pacman_y == self.ghost_y[:, i])
+            )
+            collision = same_cell | swapped
+            frightened = self.ghost_state[:, i] == FRIGHTENED
+
+            game_over |= collision & ~frightened
+
+            eaten = np.flatnonzero(collision & frightened)
+            if not len(eaten):
+                continue
+
+            t = self.current_time[eaten]
+            self.score[eaten] += self.ghost_streak[eaten]
+            self.ghost_streak[eaten] *= 2
+
+            self.ghost_direction[eaten, i] = STILL
+            self.ghost_state_change[eaten, i] = t
+            self.ghost_move_time[eaten, i] = t
+            self.ghost_state[eaten, i] = self.ghost_previous_state[eaten, i]
+            self.ghost_x[eaten, i] = self.respawn_x[i]
+            self.ghost_y[eaten, i] = self.respawn_y[i]
+            self.ghost_door_locked[eaten, i] = True
+            self.ghost_respawn_duration[eaten, i] = self.respawn_duration[i]
+            self.ghost_respawn_start[eaten, i] = t
+
+        return game_over
+
+    def _calculate_reward(self, old_score, prev_pacman_x, prev_pacman_y) -> np.ndarray:
+        # PacmanEnv._is_oscillation compares the action history with itself and never fires
+        delta = np.maximum(self.score - old_score, 0)
+        reward = delta.astype(np.float64)
+
+        stayed = (self.pacman_x == prev_pacman_x) & (self.pacman_y == prev_pacman_y)
+        reward -= 25 * stayed
+        reward -= 10 * (delta == 0)
+        reward += 250 * ((delta != 0) & ~self.dots_alive.any(axis=1))
+
+        ghost_dist = np.abs(self.ghost_x - self.pacman_x[:, None]) + np.abs(self.ghost_y - self.pacman_y[:, None])
+        chase_penalty = (self.ghost_state == CHASE) & (ghost_dist < 3)
+        frightened_bonus = (self.ghost_state == FRIGHTENED) & (ghost_dist < 8)
+
+        reward -= np.where(chase_penalty, (3 - ghost_dist) * 10, 0).sum(axis=1)
+        reward += np.where(frightened_bonus, (8 - ghost_dist) * 5, 0).sum(axis=1)
+
+        return reward
+
+    def _get_obs(self, idx: np.ndarray) -> np.ndarray:
+        n = len(idx)
+        obs = np.zeros((n, self.observation_size), dtype=np.float32)
+        fields, offset = {}, 0
+        for name, shape in OBSERVATION_FIELDS:
+            size = int(np.prod(shape))
+            fields[name] = obs[:, offset:offset + size].reshape((n,) + shape)
+            offset += size
+
+        t = self.current_time[idx]
+        pacman_x, pacman_y = self.pacman_x[idx], self.pacman_y[idx]
+        ghost_x, ghost_y = self.ghost_x[idx], self.ghost_y[idx]
+        ghost_state = self.ghost_state[idx]
+        alive = self.dots_alive[idx]
+        max_possible_dist = self.width + self.height
+
+        fields['pacman'][:, 0] = pacman_x
+        fields['pacman'][:, 1] = pacman_y
+
+        # Ghosts
+        ghosts = fields['ghosts']
+        frightened_timer = np.maximum(0, 7000 - (t[:, None] - self.ghost_state_change[idx]))
+        ghost_dist = np.abs(ghost_x - pacman_x[:, None]) + np.abs(ghost_y - pacman_y[:, None])
+
+        ghosts[:, :, 0] = ghost_x
+        ghosts[:, :, 1] = ghost_y
+        ghosts[:, :, 2] = self.ghost_types
+        ghosts[:, :, 3] = ghost_state
+        ghosts[:, :, 4] = np.where(ghost_state == FRIGHTENED, frightened_timer, 0)
+        ghosts[:, :, 5] = np.minimum(1.0, ghost_dist / max_possible_dist)
+
+        # First four remaining power pellets, in map order
+        pellets = self.dot_layout.power_pellets
+        if len(pellets):
+            pellets_alive = alive[:, pellets]
+            order = np.argsort(~pellets_alive, axis=1, kind='stable')[:, :4]
+            present = np.take_along_axis(pellets_alive, order, axis=1)
+            px, py = self.dot_x[pellets][order], self.dot_y[pellets][order]
+            pellet_dist = np.abs(px - pacman_x[:, None]) + np.abs(py - pacman_y[:, None])
+
+            count = order.shape[1]
+            power_pellets = fields['power_pellets']
+            power_pellets[:, :count, 0] = np.where(present, px, 0)
+            power_pellets[:, :count, 1] = np.where(present, py, 0)
+            power_pellets[:, :count, 2] = np.where(present, np.minimum(1.0, pellet_dist / max_possible_dist), 0)
+
+        # Four nearest dots, ties broken by map order like a stable sort
+        self._write_nearest_dots(fields['nearest_dots'], pacman_x, pacman_y, alive)
+
+        dots_left = alive.sum(axis=1)
+        fields['dots_left'][:, 0] = dots_left
+        fields['dots_eaten_percentage'][:, 0] = 1 - dots_left / self.num_dots
+
+        inside = (0 <= pacman_x) & (pacman_x < self.width) & (0 <= pacman_y) & (pacman_y < self.height)
+        moves = self.topology.pacman_moves[np.where(inside, pacman_y * self.width + pacman_x, 0)]
+
+        pacman_legal_moves = fields['pacman_legal_moves']
+        for i in range(len(DIRECTION_MAP)):
+            pacman_legal_moves[:, i] = moves >> i & 1
+        for j in np.flatnonzero(~inside):
+            pacman_legal_moves[j] = self.topology.pacman_legal_moves(int(pacman_x[j]), int(pacman_y[j]))
+
+        door = (~self.ghost_door_locked[idx]).astype(np.int64)
+        cell = ghost_y * self.width + ghost_x
+        moves = self.topology.ghost_moves[door, cell, self.ghost_direction[idx]]
+
+        ghost_legal_moves = fields['ghost_legal_moves']
+        for i in range(len(DIRECTION_MAP)):
+            ghost_legal_moves[:, :, i] = moves >> i & 1
+        ghost_legal_moves[:, :, 4] = self.ghost_types
+
+        return obs
+
+    def _write_nearest_dots(self, nearest_dots, pacman_x, pacman_y, alive):
+        inside = (0 <= pacman_x) & (pacman_x < self.width) & (0 <= pacman_y) & (pacman_y < self.height)
+        rows = np.flatnonzero(inside)
+        cell = pacman_y[rows] * self.width + pacman_x[rows]
+
+        # The four nearest remaining dots are usually among the first few of the cell's
+        # order; only games that run out of dots there scan the whole order
+        missing = self._write_from_order(nearest_dots, rows, cell, alive, NEAREST_DOTS_PREFIX)
+        self._write_from_order(nearest_dots, rows[missing], cell[missing], alive, None)
+
+        # Pac-Man can walk off the grid, where the per-cell orders do not apply
+        outside = np.flatnonzero(~inside)
+        if len(outside):
+            self._write_by_partition(nearest_dots, outside, pacman_x[outside], pacman_y[outside], alive)
+
+    def _write_from_order(self, nearest_dots, rows, cell, alive, width):
+        """Writes the games whose four nearest dots are within `width` of their cell's order; returns a mask of the rest."""
+        order = self.dot_layout.nearest_order[cell, :width]
+        present = alive[rows[:, None], order]
+        rank = np.cumsum(present, axis=1)
+
+        found = np.ones(len(rows), dtype=bool) if width is None else rank[:, -1] >= 4
+        hits, cols = np.nonzero(present & (rank <= 4) & found[:, None])
+        slots = rank[hits, cols] - 1
+
+        dots = order[hits, cols]
+        nearest_dots[rows[hits], slots, 0] = self.dot_x[dots]
+        nearest_dots[rows[hits], slots, 1] = self.dot_y[dots]
+        nearest_dots[rows[hits], slots, 2] = self.dot_layout.nearest_dist[cell[hits], cols]
+        return ~found
+
+    def _write_by_partition(self, nearest_dots, rows, pacman_x, pacman_y, alive):
+        small = self.dot_layout.small_dots
+        small_alive = alive[rows][:, small]
+        dist = np.abs(self.dot_x[small] - pacman_x[:, None]) + np.abs(self.dot_y[small] - pacman_y[:, None])
+
+        # Distance then map order as one key, so a partial sort breaks ties like a stable sort
+        key = np.where(small_alive, dist * len(small) + np.arange(len(small)), np.iinfo(np.int64).max)
+        count = min(4, len(small))
+        cols = np.argpartition(key, count - 1, axis=1)[:, :count]
+        cols = np.take_along_axis(cols, np.argsort(np.take_along_axis(key, cols, axis=1), axis=1), axis=1)
+
+        hits, slots = np.nonzero(np.take_along_axis(small_alive, cols, axis=1))
+        cols = cols[hits, slots]
+        dots = small[cols]
+        nearest_dots[rows[hits], slots, 0] = self.dot_x[dots]
+        nearest_dots[rows[hits], slots, 1] = self.dot_y[dots]
+        nearest_dots[rows[hits], slots, 2] = dist[hits, cols]
+
+    def close(self):
+        pass
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> List[Any]:
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result] * len(self._get_indices(indices))
+
+    def env_is_wrapped(self, wrapper_class: type[gym.Wrapper], indices: VecEnvIndices = None) -> List[bool]:
+        return [False] * len(self._get_indices(indices))
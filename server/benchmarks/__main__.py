@@ -0,0 +1,129 @@
+"""
+Benchmarks for the simulation and serving hot paths. Run from the server directory:
+
+    python -m benchmarks                       # all groups, compared with benchmarks/baseline.json
+    python -m benchmarks --only env,map        # skip the server group
+    python -m benchmarks --output run.json     # also write this run as JSON
+    python -m benchmarks --update-baseline     # store this run as the new baseline
+    python -m benchmarks --only server --update-baseline server.import,server.first_agents
+    python -m benchmarks.import_report         # where the server's import time goes
+
+Each run can also be appended as one JSON line to a history file (--history) for
+charting over time. Exits with status 1 when a result is worse than its baseline by
+more than the threshold. Baselines are only comparable on the machine they came from;
+each entry records the commit and time of the run it was taken from, and the file's
+environment block is that of the last run that updated it.
+"""
+
+from benchmarks.harness import Result, compare
+from typing import List
+
+import subprocess
+import argparse
+import platform
+import datetime
+import json
+import sys
+import os
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_THRESHOLD = 0.25
+
+def _groups():
+    from benchmarks import bench_env, bench_server
+
+    # bench_env covers both the environment and the map it wraps; the map is its own group
+    return {
+        "env": [b for b in bench_env.BENCHMARKS if b is not bench_env.bench_game_map],
+        "map": [bench_env.bench_game_map],
+        "server": bench_server.BENCHMARKS,
+    }
+
+def _environment() -> dict:
+    import numpy as np
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Simulation and serving benchmarks")
+    parser.add_argument("--only", default="env,map,server", help="comma-separated groups: env, map, server")
+    parser.add_argument("--rounds", type=int, default=15, help="timed rounds per benchmark")
+    parser.add_argument("--output", help="write this run as JSON")
+    parser.add_argument("--history", help="append this run as one JSON line")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="default allowed slowdown, as a fraction")
+    parser.add_argument("--update-baseline", nargs="?", const="", metavar="NAMES",
+                        help="store this run as the new baseline, or only the comma-separated NAMES")
+    args = parser.parse_args()
+
+    groups = _groups()
+    results: List[Result] = []
+    for group in args.only.split(","):
+        for benchmark in groups[group.strip()]:
+            for result in benchmark(args.rounds):
+                results.append(result)
+                print(f"{result.name:<34} {result.value:>14.2f} {result.unit}", flush=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["benchmarks"]
+
+    comparison = compare(results, baseline, args.threshold)
+    run = {
+        "environment": _environment(),
+        "rounds": args.rounds,
+        "results": [result.to_dict() for result in results],
+        "comparison": comparison,
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(run, f, indent=2)
+
+    if args.history:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(run) + "\n")
+
+    if args.update_baseline is not None:
+        names = {name.strip() for name in args.update_baseline.split(",") if name.strip()}
+        recorded = {"commit": run["environment"]["commit"], "timestamp": run["environment"]["timestamp"]}
+
+        # Thresholds set by hand in the baseline file are kept
+        for result in results:
+            if names and result.name not in names:
+                continue
+            entry = baseline.setdefault(result.name, {})
+            entry.update({
+                "value": result.value, "unit": result.unit, "higher_is_better": result.higher_is_better,
+                "recorded": recorded,
+            })
+        with open(args.baseline, 'w') as f:
+            json.dump({"environment": run["environment"], "benchmarks": baseline}, f, indent=2)
+            f.write("\n")
+        return 0
+
+    regressions = [row for row in comparison if row["regressed"]]
+    for row in regressions:
+        print(f"REGRESSION {row['name']}: {row['value']:.2f} vs baseline {row['baseline']:.2f} ({row['change']:+.0%})")
+
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
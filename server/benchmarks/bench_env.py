@@ -0,0 +1,139 @@
+from benchmarks.harness import Result, time_rounds, per_second, microseconds
+from models.characters.ghost import GhostState
+from models.map.game_map import GameMap
+from pacman_constants import GAME_MAP
+from pacman_env import PacmanEnv
+from typing import List
+
+import numpy as np
+
+SEED = 0
+WARMUP_STEPS = 40
+BLOCK_STEPS = 25
+
+# Ghost states forced at the start of every timed block, in PacmanEnv.ghosts order
+GHOST_MIXES = {
+    "scatter": [GhostState.SCATTER] * 4,
+    "chase": [GhostState.CHASE] * 4,
+    "frightened": [GhostState.FRIGHTENED] * 4,
+    "mixed": [GhostState.SCATTER, GhostState.CHASE, GhostState.FRIGHTENED, GhostState.FRIGHTENED],
+}
+
+def _actions(count: int) -> List[int]:
+    return np.random.default_rng(SEED).integers(4, size=count).tolist()
+
+def _warm_env() -> PacmanEnv:
+    # Ghosts have left the house and a few dots are gone, like in a typical mid-game state
+    env = PacmanEnv()
+    env.reset(seed=SEED)
+    for action in _actions(WARMUP_STEPS):
+        _, _, terminated, truncated, _ = env.step(action)
+        if terminated or truncated:
+            env.reset(seed=SEED)
+    return env
+
+def _force_states(env: PacmanEnv, states: List[GhostState]):
+    for ghost, state in zip(env.ghosts, states):
+        ghost.previous_state = GhostState.SCATTER if state == GhostState.FRIGHTENED else state
+        ghost.state = state
+        ghost.last_state_change = env.current_time
+
+def bench_step(rounds: int) -> List[Result]:
+    results = []
+    actions = _actions(BLOCK_STEPS)
+
+    for mix, states in GHOST_MIXES.items():
+        env = _warm_env()
+        _force_states(env, states)
+        snapshot = env.get_state()
+
+        def run() -> int:
+            steps = 0
+            for action in actions:
+                _, _, terminated, truncated, _ = env.step(action)
+                steps += 1
+                if terminated or truncated:
+                    break
+            return steps
+
+        samples = time_rounds(run, rounds, setup=lambda: env.set_state(snapshot))
+        results.append(per_second(f"env.step[{mix}]", samples, block_steps=BLOCK_STEPS))
+
+    return results
+
+def bench_reset(rounds: int) -> List[Result]:
+    env = _warm_env()
+    number = 20
+
+    def run_unseeded() -> int:
+        for _ in range(number):
+            env.reset()
+        return number
+
+    def run_seeded() -> int:
+        for _ in range(number):
+            env.reset(seed=SEED)
+        return number
+
+    return [
+        microseconds("env.reset", time_rounds(run_unseeded, rounds)),
+        microseconds("env.reset[seeded]", time_rounds(run_seeded, rounds)),
+    ]
+
+def bench_get_obs(rounds: int) -> List[Result]:
+    env = _warm_env()
+    number = 200
+
+    def run() -> int:
+        for _ in range(number):
+            env._get_obs()
+        return number
+
+    return [microseconds("env._get_obs", time_rounds(run, rounds))]
+
+def bench_ghost_direction(rounds: int) -> List[Result]:
+    env = _warm_env()
+    game_state = env._get_game_state()
+    number = 500
+
+    # Every ghost towards every corner, from its mid-game position
+    calls = [
+        (ghost, target)
+        for ghost in env.ghosts
+        for target in ((0, 0), (env.game_map.width - 1, 0), (0, env.game_map.height - 1), (env.pacman.gridX, env.pacman.gridY))
+    ]
+
+    def run() -> int:
+        for i in range(number):
+            ghost, target = calls[i % len(calls)]
+            ghost._get_direction_towards(game_state, target)
+        return number
+
+    return [microseconds("ghost._get_direction_towards", time_rounds(run, rounds))]
+
+def bench_game_map(rounds: int) -> List[Result]:
+    game_map = GameMap(GAME_MAP)
+    cells = [(x, y) for y in range(-1, game_map.height + 1) for x in range(-1, game_map.width + 1)]
+
+    def run_get_cell() -> int:
+        for x, y in cells:
+            game_map.get_cell(x, y)
+        return len(cells)
+
+    def run_is_walkable() -> int:
+        for x, y in cells:
+            game_map.is_walkable(x, y)
+            game_map.is_walkable(x, y, True)
+        return 2 * len(cells)
+
+    def run_get_dots() -> int:
+        game_map.get_dots()
+        return 1
+
+    return [
+        per_second("game_map.get_cell", time_rounds(run_get_cell, rounds)),
+        per_second("game_map.is_walkable", time_rounds(run_is_walkable, rounds)),
+        per_second("game_map.get_dots", time_rounds(run_get_dots, rounds)),
+    ]
+
+BENCHMARKS = [bench_step, bench_reset, bench_get_obs, bench_ghost_direction, bench_game_map]
@@ -0,0 +1,119 @@
+from benchmarks.import_report import SERVER_DIR, import_times, heavy_imports
+from benchmarks.harness import Result, time_rounds, milliseconds
+from fastapi.testclient import TestClient
+from agent_catalog import AgentCatalog
+from replay_cache import ReplayCache
+from typing import List
+
+import subprocess
+import tempfile
+import socket
+import signal
+import time
+import sys
+import os
+
+FIXTURE_AGENTS = os.path.join(os.path.dirname(__file__), "fixtures", "agents")
+EPISODE_URL = "/dqn/tiny/0"
+
+def bench_episode_endpoint(rounds: int) -> List[Result]:
+    """
+    Episode endpoint against the bundled tiny checkpoint, with one rollout worker and an
+    empty replay cache: the first request right after startup (cold), new seeds once the
+    worker has the policy loaded (warm), and repeated seeds served from the replay cache.
+    """
+    import server
+
+    with tempfile.TemporaryDirectory() as cache_root:
+        server.catalog = AgentCatalog(FIXTURE_AGENTS)
+        server.replay_cache = ReplayCache(cache_root)
+        server.ROLLOUT_WORKERS = 1
+
+        start = time.perf_counter()
+        with TestClient(server.app) as client:
+            startup = time.perf_counter() - start
+
+            def get(path: str, **params) -> int:
+                client.get(path, params=params).raise_for_status()
+                return 1
+
+            cold = time_rounds(lambda: get(EPISODE_URL, seed=0), 1)
+
+            seeds = iter(range(1, rounds + 1))
+            warm = time_rounds(lambda: get(EPISODE_URL, seed=next(seeds)), rounds)
+
+            seeds = iter(range(1, rounds + 1))
+            cached = time_rounds(lambda: get(EPISODE_URL, seed=next(seeds)), rounds)
+
+            agents = time_rounds(lambda: get("/agents"), rounds)
+
+    return [
+        milliseconds("server.startup", [startup]),
+        milliseconds("server.episode[cold]", cold),
+        milliseconds("server.episode[warm]", warm),
+        milliseconds("server.episode[cached]", cached),
+        milliseconds("server.agents", agents),
+    ]
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _first_response_seconds(port: int) -> float:
+    """Seconds from launching a server on the fixture agents to its first /agents response."""
+    command = (
+        "import uvicorn, server; server.ROLLOUT_WORKERS = 1; "
+        f"uvicorn.run(server.app, host='127.0.0.1', port={port}, log_level='warning')"
+    )
+    env = dict(os.environ, PYTHONPATH=SERVER_DIR)
+
+    with tempfile.TemporaryDirectory() as root:
+        os.symlink(FIXTURE_AGENTS, os.path.join(root, "agents"))
+
+        start = time.perf_counter()
+        process = subprocess.Popen([sys.executable, "-c", command], cwd=root, env=env, start_new_session=True,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                try:
+                    connection = socket.create_connection(("127.0.0.1", port), timeout=5)
+                except OSError:
+                    if process.poll() is not None:
+                        raise RuntimeError("Server exited before answering")
+                    time.sleep(0.002)
+                    continue
+
+                # Raw HTTP keeps the client from competing with the server for the CPU
+                with connection:
+                    connection.sendall(b"GET /agents HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+                    status = connection.recv(64).split(b"\r\n")[0]
+                if b" 200 " not in status:
+                    raise RuntimeError(f"/agents answered {status!r}")
+                return time.perf_counter() - start
+        finally:
+            # The whole session, so a rollout worker still starting up goes too
+            os.killpg(process.pid, signal.SIGTERM)
+            process.wait()
+
+def bench_cold_start(rounds: int) -> List[Result]:
+    """
+    `import server` in a fresh interpreter, and time from launching the server to its first
+    /agents response. Each round starts a new process, so fewer rounds are run.
+    """
+    rounds = max(1, rounds // 3)
+
+    imports, heavy = [], set()
+    for _ in range(rounds):
+        times = import_times("server")
+        imports.append(next(t for t in times if t.module == "server").cumulative_us / 1e6)
+        heavy.update(heavy_imports(times))
+
+    first_responses = [_first_response_seconds(_free_port()) for _ in range(rounds)]
+
+    return [
+        milliseconds("server.import", imports, heavy_modules=sorted(heavy)),
+        milliseconds("server.first_agents", first_responses),
+    ]
+
+BENCHMARKS = [bench_episode_endpoint, bench_cold_start]
@@ -0,0 +1,85 @@
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+
+import statistics
+import time
+import gc
+
+@dataclass
+class Result:
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool
+    samples: List[float] = field(default_factory=list)
+    params: Dict[str, object] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+def time_rounds(run: Callable[[], int], rounds: int, setup: Optional[Callable[[], None]] = None) -> List[float]:
+    """
+    Seconds per operation for each round. `run` performs one round and returns how many
+    operations it did; `setup` runs untimed before every round. The collector is off while
+    timing, as in timeit.
+    """
+    samples = []
+    gc_enabled = gc.isenabled()
+    try:
+        for _ in range(rounds):
+            if setup is not None:
+                setup()
+
+            gc.disable()
+            start = time.perf_counter_ns()
+            operations = run()
+            elapsed = time.perf_counter_ns() - start
+            if gc_enabled:
+                gc.enable()
+
+            if operations:
+                samples.append(elapsed / operations / 1e9)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    return samples
+
+def per_second(name: str, samples: List[float], **params) -> Result:
+    rates = [1 / sample for sample in samples]
+    return Result(name, statistics.median(rates), "ops/s", True, rates, params)
+
+def microseconds(name: str, samples: List[float], **params) -> Result:
+    values = [sample * 1e6 for sample in samples]
+    return Result(name, statistics.median(values), "us", False, values, params)
+
+def milliseconds(name: str, samples: List[float], **params) -> Result:
+    values = [sample * 1e3 for sample in samples]
+    return Result(name, statistics.median(values), "ms", False, values, params)
+
+def compare(results: List[Result], baseline: dict, default_threshold: float) -> List[dict]:
+    """
+    Checks results against a baseline of {name: {"value", "threshold"?}}. A result regresses
+    when it is worse than the baseline value by more than the threshold, as a fraction.
+    """
+    rows = []
+    for result in results:
+        reference = baseline.get(result.name)
+        if reference is None:
+            rows.append({"name": result.name, "value": result.value, "baseline": None, "change": None, "regressed": False})
+            continue
+
+        threshold = reference.get("threshold", default_threshold)
+        change = (result.value - reference["value"]) / reference["value"]
+        worse = -change if result.higher_is_better else change
+
+        rows.append({
+            "name": result.name,
+            "value": result.value,
+            "baseline": reference["value"],
+            "change": change,
+            "threshold": threshold,
+            "regressed": worse > threshold,
+        })
+
+    return rows
@@ -0,0 +1,71 @@
+"""
+Import-time report of the server process. Run from the server directory:
+
+    python -m benchmarks.import_report             # slowest imports of `import server`
+    python -m benchmarks.import_report --top 30
+
+Exits with status 1 when importing server loads part of the ML stack, which only rollout
+workers should import.
+"""
+
+from dataclasses import dataclass
+from typing import List
+
+import subprocess
+import argparse
+import sys
+import os
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages the server process must not import before its first rollout
+HEAVY_MODULES = ("torch", "stable_baselines3", "sb3_contrib", "gymnasium", "matplotlib", "numpy")
+
+@dataclass
+class ImportTime:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+def import_times(module: str = "server") -> List[ImportTime]:
+    """-X importtime of importing `module` in a fresh interpreter, in import order."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SERVER_DIR, capture_output=True, text=True, check=True
+    )
+
+    times = []
+    for line in process.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        times.append(ImportTime(name.strip(), int(self_us), int(cumulative_us), depth))
+    return times
+
+def heavy_imports(times: List[ImportTime]) -> List[str]:
+    return sorted({t.module.split(".")[0] for t in times} & set(HEAVY_MODULES))
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.import_report", description="Server import-time report")
+    parser.add_argument("--module", default="server")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list, by cumulative time")
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    total = next(t for t in times if t.module == args.module)
+    print(f"import {args.module}: {total.cumulative_us / 1e3:.1f} ms, {len(times)} modules")
+
+    print(f"{'module':<48} {'self ms':>9} {'cumul ms':>9}")
+    for t in sorted(times, key=lambda t: t.cumulative_us, reverse=True)[:args.top]:
+        print(f"{'  ' * t.depth + t.module:<48} {t.self_us / 1e3:>9.1f} {t.cumulative_us / 1e3:>9.1f}")
+
+    heavy = heavy_imports(times)
+    if heavy:
+        print(f"HEAVY IMPORTS {', '.join(heavy)}: only rollout workers should load them")
+    return 1 if heavy else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+from dataclasses import dataclass, asdict
+from typing import Iterable, List, Optional, Set
+
+import argparse
+import hashlib
+import math
+import json
+import time
+import os
+import re
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+CHECKPOINT_PATTERN = re.compile(r"model_(\d+)_steps\.zip")
+
+@dataclass
+class CheckpointRecord:
+    file: str                     # relative to the checkpoints directory
+    steps: int
+    size: int
+    sha256: str
+    eval_score: Optional[float]   # latest evaluation when the checkpoint was saved, if any
+    saved_at: float
+
+def file_digest(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+class CheckpointManifest:
+    """
+    checkpoints/manifest.json: one record per kept checkpoint, sorted by steps. Readers
+    get the checkpoint list with a single file read instead of scanning the directory.
+    """
+
+    def __init__(self, directory: str, records: Optional[List[CheckpointRecord]] = None):
+        self.directory = directory
+        self.records = records or []
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, directory: str) -> Optional['CheckpointManifest']:
+        try:
+            with open(os.path.join(directory, MANIFEST_NAME), 'r') as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if data.get("version") != MANIFEST_VERSION:
+            return None
+        return cls(directory, [CheckpointRecord(**record) for record in data["checkpoints"]])
+
+    def add(self, file_path: str, steps: int, eval_score: Optional[float] = None) -> CheckpointRecord:
+        record = CheckpointRecord(
+            file=os.path.basename(file_path),
+            steps=steps,
+            size=os.path.getsize(file_path),
+            sha256=file_digest(file_path),
+            eval_score=eval_score if eval_score is None or math.isfinite(eval_score) else None,
+            saved_at=time.time(),
+        )
+
+        self.records = [r for r in self.records if r.file != record.file] + [record]
+        self.records.sort(key=lambda r: r.steps)
+        return record
+
+    def remove(self, files: Iterable[str]):
+        """Deletes the given checkpoints, and their NumPy exports, from disk and from the manifest."""
+        # Imported here: the server reads manifests and never needs numpy for that
+        from numpy_policy import exported_policy_path
+
+        files = set(files)
+        for file in files:
+            path = os.path.join(self.directory, file)
+            for stale in (path, exported_policy_path(path)):
+                try:
+                    os.remove(stale)
+                except FileNotFoundError:
+                    pass
+        self.records = [r for r in self.records if r.file not in files]
+
+    def save(self):
+        # Written aside and renamed, so readers never see a partial manifest
+        data = {"version": MANIFEST_VERSION, "checkpoints": [asdict(record) for record in self.records]}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+def retained_checkpoints(records: List[CheckpointRecord], keep_recent: int = 10, per_decade: int = 20,
+                         keep_best: int = 5) -> Set[str]:
+    """
+    Files to keep: the `keep_recent` newest checkpoints, the `keep_best` best by eval
+    score, and of the older ones one per log-spaced step bucket, `per_decade` buckets per
+    tenfold increase in steps. A bucket keeps its best-scored checkpoint, else its newest.
+    """
+    records = sorted(records, key=lambda r: r.steps)
+    keep = {r.file for r in records[len(records) - keep_recent:]} if keep_recent else set()
+
+    scored = [r for r in records if r.eval_score is not None]
+    keep.update(r.file for r in sorted(scored, key=lambda r: r.eval_score, reverse=True)[:keep_best])
+
+    buckets = {}
+    for record in records:
+        bucket = math.floor(math.log10(max(record.steps, 1)) * per_decade)
+        rank = (record.eval_score if record.eval_score is not None else -math.inf, record.steps)
+        if bucket not in buckets or rank > buckets[bucket][0]:
+            buckets[bucket] = (rank, record.file)
+    keep.update(file for _, file in buckets.values())
+
+    return keep
+
+def build_manifest(directory: str) -> CheckpointManifest:
+    """Manifest of the model_<steps>_steps.zip files already in a directory, without eval scores."""
+    manifest = CheckpointManifest(directory)
+    for filename in os.listdir(directory):
+        match = CHECKPOINT_PATTERN.match(filename)
+        if match:
+            manifest.add(os.path.join(directory, filename), int(match.group(1)))
+    return manifest
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write the manifest of an existing checkpoints directory")
+    parser.add_argument("directory", help="e.g. agents/<algo>/<model>/checkpoints")
+    parser.add_argument("--thin", action="store_true", help="also delete checkpoints the retention policy drops")
+    args = parser.parse_args()
+
+    manifest = build_manifest(args.directory)
+    if args.thin:
+        keep = retained_checkpoints(manifest.records)
+        manifest.remove(r.file for r in manifest.records if r.file not in keep)
+    manifest.save()
+    print(f"{len(manifest.records)} checkpoints in {manifest.path}")
@@ -0,0 +1,43 @@
+from checkpoint_manifest import CheckpointManifest, retained_checkpoints
+from stable_baselines3.common.callbacks import CheckpointCallback
+from typing import Callable, Optional
+
+class RetentionCheckpointCallback(CheckpointCallback):
+    """
+    CheckpointCallback that records every save in checkpoints/manifest.json (steps, size,
+    sha256 and the latest eval score from `eval_score`) and then thins older checkpoints
+    with retained_checkpoints(), so a long run keeps a bounded, log-spaced set.
+    """
+
+    def __init__(self, save_freq: int, save_path: str, name_prefix: str = "model",
+                 eval_score: Optional[Callable[[], Optional[float]]] = None,
+                 keep_recent: int = 10, per_decade: int = 20, keep_best: int = 5, verbose: int = 0):
+        super().__init__(save_freq, save_path, name_prefix=name_prefix, verbose=verbose)
+        self.eval_score = eval_score
+        self.keep_recent = keep_recent
+        self.per_decade = per_decade
+        self.keep_best = keep_best
+
+        self.manifest = None
+
+    def _init_callback(self) -> None:
+        super()._init_callback()
+        # Resumed runs carry on with the manifest they left behind
+        self.manifest = CheckpointManifest.load(self.save_path) or CheckpointManifest(self.save_path)
+
+    def _on_step(self) -> bool:
+        result = super()._on_step()
+
+        if self.n_calls % self.save_freq == 0:
+            score = self.eval_score() if self.eval_score is not None else None
+            self.manifest.add(self._checkpoint_path(extension="zip"), self.num_timesteps, score)
+
+            keep = retained_checkpoints(self.manifest.records, self.keep_recent, self.per_decade, self.keep_best)
+            dropped = [record.file for record in self.manifest.records if record.file not in keep]
+            self.manifest.remove(dropped)
+            self.manifest.save()
+
+            if dropped and self.verbose >= 2:
+                print(f"Removed {len(dropped)} thinned checkpoints, {len(self.manifest.records)} kept")
+
+        return result
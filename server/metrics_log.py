@@ -0,0 +1,97 @@
+from typing import Optional
+
+import numpy as np
+import time
+import os
+
+METRICS_MAGIC = b"PMML"
+METRICS_VERSION = 1
+HEADER_SIZE = 8
+
+# One fixed-size record per finished episode
+EPISODE_DTYPE = np.dtype([
+    ('timesteps', '<i8'),   # training timesteps when the episode ended
+    ('env', '<i4'),
+    ('length', '<i4'),
+    ('reward', '<f8'),
+    ('wall_time', '<f8'),   # seconds since the epoch
+])
+
+def _check_header(f, path: str):
+    header = f.read(HEADER_SIZE)
+    if len(header) < HEADER_SIZE or header[:4] != METRICS_MAGIC or header[4] != METRICS_VERSION:
+        raise ValueError(f"{path} is not a version {METRICS_VERSION} metrics log")
+
+def archived_log_path(path: str) -> str:
+    """episodes.bin -> episodes.<last modified>.bin, where an earlier run's log is kept."""
+    root, extension = os.path.splitext(path)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(os.path.getmtime(path)))
+    return f"{root}.{stamp}{extension}"
+
+class MetricsLog:
+    """
+    Append-only log of episode records. Records are buffered in memory and appended to
+    the file on flush(); a record cut short by a crash is ignored when reading, so the
+    log stays readable while the run is going and after it was killed.
+
+    Each training run starts a new log and an earlier run's log is moved aside, so runs
+    under the same model name never mix; with `resume`, records go on after the existing
+    ones instead, once its header checks out.
+    """
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        self._pending = []
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if os.path.exists(path):
+            if resume:
+                with open(path, 'rb') as f:
+                    _check_header(f, path)
+                return
+            os.replace(path, archived_log_path(path))
+
+        with open(path, 'wb') as f:
+            f.write(METRICS_MAGIC + bytes([METRICS_VERSION]) + bytes(HEADER_SIZE - len(METRICS_MAGIC) - 1))
+
+    def append(self, timesteps: int, envs: np.ndarray, lengths: np.ndarray, rewards: np.ndarray):
+        records = np.zeros(len(envs), dtype=EPISODE_DTYPE)
+        records['timesteps'] = timesteps
+        records['env'] = envs
+        records['length'] = lengths
+        records['reward'] = rewards
+        records['wall_time'] = time.time()
+        self._pending.append(records)
+
+    def flush(self) -> int:
+        """Appends the buffered records; returns how many were written."""
+        if not self._pending:
+            return 0
+
+        records = np.concatenate(self._pending)
+        self._pending.clear()
+
+        with open(self.path, 'ab') as f:
+            # A partial record left by a crash would shift everything after it
+            size = f.tell()
+            misaligned = (size - HEADER_SIZE) % EPISODE_DTYPE.itemsize
+            if misaligned:
+                f.truncate(size - misaligned)
+                f.seek(size - misaligned)
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+        return len(records)
+
+def read_episodes(path: str, start: int = 0, count: Optional[int] = None) -> np.ndarray:
+    """Episode records of a log, from record `start` on; incomplete trailing bytes are skipped."""
+    with open(path, 'rb') as f:
+        _check_header(f, path)
+
+        size = os.fstat(f.fileno()).st_size
+        available = max((size - HEADER_SIZE) // EPISODE_DTYPE.itemsize - start, 0)
+        count = available if count is None else min(count, available)
+
+        f.seek(HEADER_SIZE + start * EPISODE_DTYPE.itemsize)
+        return np.frombuffer(f.read(count * EPISODE_DTYPE.itemsize), dtype=EPISODE_DTYPE)
@@ -0,0 +1,91 @@
+from numpy_policy import NumpyPolicy, current_export
+from collections import OrderedDict
+from typing import Optional
+
+import threading
+import os
+
+def load_checkpoint(model_path: str, torch_threads: Optional[int] = None):
+    from stable_baselines3 import DQN
+    from sb3_contrib import QRDQN
+    import torch
+
+    if torch_threads is not None:
+        torch.set_num_threads(torch_threads)
+    return QRDQN.load(model_path) if 'qrdqn' in model_path.lower() else DQN.load(model_path)
+
+def load_model(model_path: str, torch_threads: Optional[int] = None):
+    """
+    The policy of a checkpoint: its NumPy export when an up-to-date one sits next to it,
+    which needs no torch, else the SB3 model.
+    """
+    policy_path = current_export(model_path)
+    if policy_path is not None:
+        return NumpyPolicy.load(policy_path)
+    return load_checkpoint(model_path, torch_threads)
+
+def model_size(model) -> int:
+    if isinstance(model, NumpyPolicy):
+        return model.nbytes
+    return sum(p.numel() * p.element_size() for p in model.policy.parameters())
+
+class ModelCache:
+    """
+    LRU cache of loaded policies keyed by (checkpoint path, mtime, export mtime), bounded
+    both by the number of entries and by the total size of their parameters. A checkpoint
+    that is rewritten or exported gets a new key, so the stale model is never served.
+    """
+
+    def __init__(self, max_entries: int = 8, max_bytes: int = 512 * 1024 * 1024,
+                 torch_threads: Optional[int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.torch_threads = torch_threads
+
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_path: str):
+        policy_path = current_export(model_path)
+        key = (model_path, os.stat(model_path).st_mtime_ns, policy_path and os.stat(policy_path).st_mtime_ns)
+
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                return model
+
+        # Deserialising is slow, so it happens outside the lock
+        model = load_model(model_path, self.torch_threads)
+        self._insert(key, model)
+        return model
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def _insert(self, key: tuple, model):
+        size = model_size(model)
+
+        with self._lock:
+            # Older versions of the same checkpoint can never be requested again
+            for stale in [k for k in self._models if k[0] == key[0] and k != key]:
+                self._evict(stale)
+
+            self._models[key] = model
+            self._sizes[key] = size
+            self._models.move_to_end(key)
+
+            # Always keep the newest entry, even if it alone exceeds the byte budget
+            while len(self._models) > 1 and (
+                len(self._models) > self.max_entries or sum(self._sizes.values()) > self.max_bytes
+            ):
+                self._evict(next(iter(self._models)))
+
+    def _evict(self, key: tuple):
+        del self._models[key]
+        del self._sizes[key]
@@ -1,4 +1,6 @@
 from models.interfaces import Direction, CellType
+from models.random_stream import RandomStream
+from models.map.path_table import PathTable
 from pacman_constants import DIRECTION_MAP
 from models.map.game_map import GameMap
 from typing import Tuple
@@ -18,17 +20,44 @@ class GhostState(Enum):
     SCATTER = 1
     CHASE = 2
 
+SCATTER_CHASE_CYCLE = [7000, 20000, 7000, 20000, 5000, 20000, 5000, float('inf')]
+
+RESPAWN_POINTS = {
+    GhostType.BLINKY: (9, 9),
+    GhostType.PINKY: (9, 9),
+    GhostType.INKY: (10, 9),
+    GhostType.CLYDE: (8, 9)
+}
+
+RESPAWN_DURATIONS = {
+    GhostType.BLINKY: 1500,
+    GhostType.PINKY: 2000,
+    GhostType.INKY: 4000,
+    GhostType.CLYDE: 6000
+}
+
 class Ghost:
     def __init__(self, ghost_type: GhostType, x: int, y: int, game_map: GameMap):
+        self.type = ghost_type
+        
+        self.game_map = game_map
+        self.path_table = PathTable.for_map(game_map)
+        self.topology = game_map.topology
+        
+        self.start_position = (x, y)
+        self.scatter_target = self._get_scatter_target()
+        
+        # Source of random moves; PacmanEnv hands its own seeded stream to the ghosts
+        self.rng = RandomStream(np.random.default_rng())
+        self.reset()
+    
+    def reset(self):
         self.previous_state = GhostState.SCATTER
         self.state = GhostState.SCATTER
-        self.type = ghost_type
         
         self.is_game_over = False
-        self.game_map = game_map
         
-        self.gridX = x
-        self.gridY = y
+        self.gridX, self.gridY = self.start_position
         
         self.next_direction = Direction(0, 0)
         self.direction = Direction(0, 0)
@@ -37,7 +66,6 @@ class Ghost:
         self.last_state_change = 0
         self.last_move_time = 0
         
-        self.scatter_target = self._get_scatter_target()
         self.cycle_index = 0
         
         self.respawn_start_time = 0
@@ -88,13 +116,8 @@ class Ghost:
         if not self.game_map.is_walkable(x, y, self._can_pass_door()):
             return False
         
-        valid_directions = [
-            d for d in DIRECTION_MAP 
-            if self.game_map.is_walkable(self.gridX + d.x, self.gridY + d.y, self._can_pass_door())
-        ]
-        
         # If only one valid direction, allow it even if it's going back
-        if len(valid_directions) == 1:
+        if len(self.topology.exits(self.gridX, self.gridY, self._can_pass_door())) == 1:
             return True
         
         # Prevent turning around
@@ -105,6 +128,10 @@ class Ghost:
         
         return not is_opposite_direction
     
+    def legal_moves(self) -> list:
+        """Per DIRECTION_MAP entry, whether moving that way is a valid position."""
+        return self.topology.ghost_legal_moves(self.gridX, self.gridY, self.direction, self._can_pass_door())
+    
     def _can_pass_door(self) -> bool:
         return not self.door_locked
     
@@ -118,7 +145,6 @@ class Ghost:
             self.gridY = newY
     
     def _handle_state_transition(self, current_time: int):
-        scatter_chase_cycle = [7000, 20000, 7000, 20000, 5000, 20000, 5000, float('inf')]
         since_last_change = current_time - self.last_state_change
         
         if self.state == GhostState.FRIGHTENED:
@@ -127,10 +153,10 @@ class Ghost:
                 self.last_state_change = current_time
             return
         
-        if since_last_change > scatter_chase_cycle[self.cycle_index]:
+        if since_last_change > SCATTER_CHASE_CYCLE[self.cycle_index]:
             self.previous_state = self.state
             self.state = GhostState.SCATTER if self.state == GhostState.CHASE else GhostState.CHASE
-            self.cycle_index = min(self.cycle_index + 1, len(scatter_chase_cycle) - 1)
+            self.cycle_index = min(self.cycle_index + 1, len(SCATTER_CHASE_CYCLE) - 1)
             self.last_state_change = current_time
     
     def _update_speed(self, current_time: int):
@@ -153,71 +179,27 @@ class Ghost:
         return scatter_targets[self.type]
     
     def _get_direction_towards(self, game_state: dict, target: Tuple[int, int]) -> Direction:
-        width, height = self.game_map.width, self.game_map.height
-        targetX, targetY = target
-        
-        targetX = max(0, min(targetX, width - 1))
-        targetY = max(0, min(targetY, height - 1))
-        
-        queue = [(self.gridX, self.gridY)]
-        cost = [[None for _ in range(height)] for _ in range(width)]
-        cost[self.gridX][self.gridY] = {'distance': 0, 'parent': None}
+        direction = self.path_table.get_direction(
+            self.gridX, 
+            self.gridY, 
+            self.direction, 
+            self._can_pass_door(), 
+            target
+        )
         
-        closest = {
-            'x': self.gridX,
-            'y': self.gridY,
-            'distance': abs(self.gridX - targetX) + abs(self.gridY - targetY)
-        }
+        if direction is None:
+            return self._get_valid_random_direction()
         
-        while queue:
-            x, y = queue.pop(0)
-            distance = abs(x - targetX) + abs(y - targetY)
-            
-            if distance < closest['distance']:
-                closest = {'x': x, 'y': y, 'distance': distance}
-            
-            if x == targetX and y == targetY:
-                break
-            
-            for direction in DIRECTION_MAP:
-                nx, ny = x + direction.x, y + direction.y
-                
-                if not self._is_valid_position(nx, ny) or cost[nx][ny] is not None:
-                    continue
-                
-                cost[nx][ny] = {
-                    'distance': cost[x][y]['distance'] + 1,
-                    'parent': (-direction.x, -direction.y)
-                }
-                queue.append((nx, ny))
-        
-        return self._trace_back_direction(cost, closest['x'], closest['y'])
-    
-    def _trace_back_direction(self, cost, x: int, y: int) -> Direction:
-        while cost[x][y] and cost[x][y]['parent']:
-            parent_dx, parent_dy = cost[x][y]['parent']
-            px, py = x + parent_dx, y + parent_dy
-            
-            if px == self.gridX and py == self.gridY:
-                return Direction(x - px, y - py)
-            
-            x, y = px, py
-        
-        return self._get_valid_random_direction()
+        return direction
     
     def _get_valid_random_direction(self) -> Direction:
-        valid_directions = [
-            direction for direction in DIRECTION_MAP
-            if self._is_valid_position(
-                self.gridX + direction.x, 
-                self.gridY + direction.y
-            )
-        ]
+        legal_moves = self.legal_moves()
+        valid_directions = [direction for direction, legal in zip(DIRECTION_MAP, legal_moves) if legal]
         
         if not valid_directions:
             return Direction(0, 0)
     
-        return np.random.choice(valid_directions) 
+        return self.rng.choice(valid_directions)
         
     def _select_chase_direction(self, game_state: dict) -> Direction:
         return self._get_valid_random_direction()
@@ -234,22 +216,10 @@ class Ghost:
         self.last_move_time = current_time
         self.state = self.previous_state
         
-        respawn_points = {
-            GhostType.BLINKY: (9, 9),
-            GhostType.PINKY: (9, 9),
-            GhostType.INKY: (10, 9),
-            GhostType.CLYDE: (8, 9)
-        }
-        
-        self.gridX, self.gridY = respawn_points[self.type]
+        self.gridX, self.gridY = RESPAWN_POINTS[self.type]
         self.door_locked = True
         
-        self.respawn_duration = {
-            GhostType.BLINKY: 1500,
-            GhostType.PINKY: 2000,
-            GhostType.INKY: 4000,
-            GhostType.CLYDE: 6000
-        }[self.type]
+        self.respawn_duration = RESPAWN_DURATIONS[self.type]
         
         self.respawn_start_time = current_time
     
@@ -5,12 +5,15 @@ import numpy as np
 
 class Pacman:
     def __init__(self, game_map: GameMap, x: int, y: int):
-        self.is_game_over = False
         self.game_map = game_map
+        self.start_position = (x, y)
+        self.reset()
+    
+    def reset(self):
+        self.is_game_over = False
         self.last_move_time = 0
         
-        self.gridX = x
-        self.gridY = y
+        self.gridX, self.gridY = self.start_position
         
         self.next_direction = Direction(0, 0)
         self.direction = Direction(0, 0)
@@ -25,17 +28,13 @@ class Pacman:
         if self.game_map.is_walkable(self.gridX + self.next_direction.x, self.gridY + self.next_direction.y):
             self.direction = Direction(self.next_direction.x, self.next_direction.y)
         else:
-            teleport_points = self.game_map.get_teleport_points()
-            if not teleport_points or len(teleport_points) < 2:
+            teleport_pairs = self.game_map.topology.teleport_pairs
+            if not teleport_pairs:
                 return False
         
-            point_a, point_b = teleport_points[0], teleport_points[1]
-            if (self.gridX, self.gridY) == (point_a[0], point_a[1]):
-                self.gridX, self.gridY = point_b[0], point_b[1]
-                self.last_move_time = current_time + 250    
-                return True
-            elif (self.gridX, self.gridY) == (point_b[0], point_b[1]):
-                self.gridX, self.gridY = point_a[0], point_a[1]
+            target = teleport_pairs.get((self.gridX, self.gridY))
+            if target is not None:
+                self.gridX, self.gridY = target
                 self.last_move_time = current_time + 250
                 return True
             
@@ -0,0 +1,114 @@
+from models.interfaces import CellType, Dot
+from models.map.game_map import GameMap
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+class DotLayout:
+    """
+    Static dot data of a maze: dot positions in map order and, for every Pac-Man cell,
+    the small dots (not power pellets) sorted by Manhattan distance, ties in map order.
+    """
+
+    _cache: Dict[bytes, 'DotLayout'] = {}
+
+    def __init__(self, game_map: GameMap):
+        self.width = game_map.width
+        self.height = game_map.height
+
+        self.dots = game_map.get_dots()
+        self.x = np.array([dot.gridX for dot in self.dots], dtype=np.int64)
+        self.y = np.array([dot.gridY for dot in self.dots], dtype=np.int64)
+        self.is_pellet = np.array([dot.type == CellType.PowerPellet for dot in self.dots], dtype=bool)
+
+        self.index_at = np.full((self.height, self.width), -1, dtype=np.int64)
+        self.index_at[self.y, self.x] = np.arange(len(self.dots))
+
+        self.small_dots = np.flatnonzero(~self.is_pellet)
+        self.power_pellets = np.flatnonzero(self.is_pellet)
+
+        cell_y, cell_x = np.divmod(np.arange(self.width * self.height), self.width)
+        self.nearest_order, self.nearest_dist = self._sort_small_dots(cell_x, cell_y)
+
+    @classmethod
+    def for_map(cls, game_map: GameMap) -> 'DotLayout':
+        key = game_map.grid.tobytes()
+        layout = cls._cache.get(key)
+
+        if layout is None:
+            layout = cls._cache[key] = cls(game_map)
+
+        return layout
+
+    def sorted_small_dots(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        inside = (0 <= x) & (x < self.width) & (0 <= y) & (y < self.height)
+        cell = np.where(inside, y * self.width + x, 0)
+
+        order = self.nearest_order[cell]
+        dist = self.nearest_dist[cell]
+
+        # Pac-Man can walk off the grid, where the per-cell tables do not apply
+        outside = np.flatnonzero(~inside)
+        if len(outside):
+            order[outside], dist[outside] = self._sort_small_dots(x[outside], y[outside])
+
+        return order, dist
+
+    def _sort_small_dots(self, x: np.ndarray, y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        small_x, small_y = self.x[self.small_dots], self.y[self.small_dots]
+        dist = np.abs(small_x[None, :] - x[:, None]) + np.abs(small_y[None, :] - y[:, None])
+
+        order = np.argsort(dist, axis=1, kind='stable')
+        return self.small_dots[order], np.take_along_axis(dist, order, axis=1)
+
+class DotIndex:
+    """
+    Remaining dots of one game. Eating a dot only clears its alive flag, and the
+    nearest-dot query walks the precomputed per-cell order, so both are near-constant.
+    """
+
+    def __init__(self, game_map: GameMap):
+        self.layout = DotLayout.for_map(game_map)
+        self.alive = np.ones(len(self.layout.dots), dtype=bool)
+        self.remaining = len(self.layout.dots)
+
+    def __len__(self) -> int:
+        return self.remaining
+
+    def __iter__(self) -> Iterator[Dot]:
+        return (self.layout.dots[i] for i in np.flatnonzero(self.alive))
+
+    def reset(self):
+        self.alive[:] = True
+        self.remaining = len(self.layout.dots)
+
+    def remove(self, x: int, y: int) -> Optional[Dot]:
+        if not (0 <= x < self.layout.width and 0 <= y < self.layout.height):
+            return None
+
+        i = self.layout.index_at[y, x]
+        if i < 0 or not self.alive[i]:
+            return None
+
+        self.alive[i] = False
+        self.remaining -= 1
+        return self.layout.dots[i]
+
+    def power_pellets(self, count: int = 4) -> List[Dot]:
+        pellets = self.layout.power_pellets
+        return [self.layout.dots[i] for i in pellets[self.alive[pellets]][:count]]
+
+    def nearest(self, x: int, y: int, count: int = 4) -> np.ndarray:
+        """Up to `count` nearest remaining small dots as rows of [x, y, distance]."""
+        layout = self.layout
+
+        if 0 <= x < layout.width and 0 <= y < layout.height:
+            order = layout.nearest_order[y * layout.width + x]
+            dist = layout.nearest_dist[y * layout.width + x]
+        else:
+            order, dist = layout.sorted_small_dots(np.array([x]), np.array([y]))
+            order, dist = order[0], dist[0]
+
+        hits = np.flatnonzero(self.alive[order])[:count]
+        dots = order[hits]
+        return np.stack([layout.x[dots], layout.y[dots], dist[hits]], axis=1)
@@ -1,49 +1,122 @@
+from models.map.topology import MapTopology
 from models.interfaces import CellType, Dot
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+CELL_TYPES = tuple(CellType)
+
+# Walkability per cell type value, without and with door access
+WALKABLE = tuple(cell not in (CellType.Wall, CellType.Door) for cell in CELL_TYPES)
+WALKABLE_WITH_DOOR = tuple(cell != CellType.Wall for cell in CELL_TYPES)
+
+# Cell types that can change without affecting the map topology
+STATIC_FREE = tuple(cell in (CellType.Empty, CellType.Dot, CellType.PowerPellet) for cell in CELL_TYPES)
 
 class GameMap:
     def __init__(self, map_data: List[List[int]]):
-        self.grid = [[CellType(cell) for cell in row] for row in map_data]
-        self.width = len(self.grid[0]) if self.grid else 0
-        self.height = len(self.grid)
-    
+        self.height = len(map_data)
+        self.width = len(map_data[0]) if map_data else 0
+
+        # The uint8 grid is a view over the bytearray: scalar lookups index the
+        # bytes directly (cheaper than numpy scalar indexing), bulk queries use numpy
+        self._cells = bytearray(np.asarray(map_data, dtype=np.uint8).tobytes())
+        self.grid = np.frombuffer(self._cells, dtype=np.uint8).reshape(self.height, self.width)
+        self._topology = None
+
+    @property
+    def topology(self) -> 'MapTopology':
+        # Shared by every map with the same layout; rebuilt only if a wall, door or ghost cell changes
+        if self._topology is None:
+            self._topology = MapTopology.for_map(self)
+        return self._topology
+
+    def layout_key(self) -> tuple:
+        # Eating dots does not change how characters can move
+        layout = np.where(self.dot_mask(), np.uint8(CellType.Empty), self.grid)
+        return (self.width, self.height, layout.tobytes())
+
+    def restore(self, template: 'MapTemplate'):
+        # Same-size slice assignment keeps the numpy view over the buffer valid
+        self._cells[:] = template.cells
+        self._topology = template.topology
+
     def get_cell(self, x: int, y: int) -> Optional[CellType]:
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.grid[y][x]
+            return CELL_TYPES[self._cells[y * self.width + x]]
         return None
-    
+
     def set_cell(self, x: int, y: int, cell_type: CellType):
         if 0 <= x < self.width and 0 <= y < self.height:
-            self.grid[y][x] = cell_type
-    
+            i = y * self.width + x
+            if self._topology is not None and not (STATIC_FREE[self._cells[i]] and STATIC_FREE[cell_type]):
+                self._topology = None
+            self._cells[i] = cell_type
+
     def is_walkable(self, x: int, y: int, can_pass_door: bool = False) -> bool:
-        cell = self.get_cell(x, y)
-        
-        if cell == CellType.Door:
-            return can_pass_door
-            
-        return cell != CellType.Wall
-    
+        if 0 <= x < self.width and 0 <= y < self.height:
+            walkable = WALKABLE_WITH_DOOR if can_pass_door else WALKABLE
+            return walkable[self._cells[y * self.width + x]]
+
+        # Off-grid cells are not walls
+        return True
+
+    def walkable_mask(self, can_pass_door: bool = False) -> np.ndarray:
+        walkable = np.array(WALKABLE_WITH_DOOR if can_pass_door else WALKABLE)
+        return walkable[self.grid]
+
+    def cell_mask(self, *cell_types: CellType) -> np.ndarray:
+        return np.isin(self.grid, cell_types)
+
+    def dot_mask(self) -> np.ndarray:
+        return self.cell_mask(CellType.Dot, CellType.PowerPellet)
+
+    def count(self, *cell_types: CellType) -> int:
+        return int(np.count_nonzero(self.cell_mask(*cell_types)))
+
+    def cell_counts(self) -> Dict[CellType, int]:
+        counts = np.bincount(self.grid.ravel(), minlength=len(CELL_TYPES))
+        return {cell: int(counts[cell]) for cell in CELL_TYPES}
+
     def get_dots(self) -> List[Dot]:
-        dots = []
-        
-        for y in range(self.height):
-            for x in range(self.width):
-                cell = self.grid[y][x]
-                
-                if cell in [CellType.Dot, CellType.PowerPellet]:
-                    dots.append(Dot(x, y, cell))
-                    
-        return dots
-    
+        ys, xs = np.nonzero(self.dot_mask())
+        cells = self.grid[ys, xs]
+
+        return [
+            Dot(x, y, CELL_TYPES[cell])
+            for x, y, cell in zip(xs.tolist(), ys.tolist(), cells.tolist())
+        ]
+
     def get_teleport_points(self) -> List[Tuple[int, int]]:
-        points = []
-        
-        for y in range(self.height):
-            for x in [0, self.width - 1]:
-                cell = self.get_cell(x, y)
-                
-                if cell in [CellType.Empty, CellType.Dot, CellType.PowerPellet]:
-                    points.append((x, y))
-                    
-        return points
\ No newline at end of file
+        if not self.width:
+            return []
+
+        columns = [0, self.width - 1]
+        border = np.isin(self.grid[:, columns], (CellType.Empty, CellType.Dot, CellType.PowerPellet))
+        ys, i = np.nonzero(border)
+
+        return [(columns[c], y) for y, c in zip(ys.tolist(), i.tolist())]
+
+class MapTemplate:
+    """
+    A map compiled once: its initial cells and the data derived from them, from which
+    a GameMap is restored with a single buffer copy instead of being rebuilt.
+    """
+
+    def __init__(self, map_data: List[List[int]]):
+        game_map = GameMap(map_data)
+
+        self.width = game_map.width
+        self.height = game_map.height
+        self.cells = bytes(game_map._cells)
+        self.topology = game_map.topology
+        self.total_dots = game_map.count(CellType.Dot, CellType.PowerPellet)
+
+    def instantiate(self) -> GameMap:
+        game_map = GameMap.__new__(GameMap)
+        game_map.width = self.width
+        game_map.height = self.height
+        game_map._cells = bytearray(self.cells)
+        game_map.grid = np.frombuffer(game_map._cells, dtype=np.uint8).reshape(self.height, self.width)
+        game_map._topology = self.topology
+        return game_map
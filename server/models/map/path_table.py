@@ -0,0 +1,116 @@
+from models.map.topology import HEADINGS, STILL
+from pacman_constants import DIRECTION_MAP
+from models.map.game_map import GameMap
+from models.interfaces import Direction
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+UNKNOWN = -2
+NO_MOVE = -1
+
+class PathTable:
+    """
+    Next-hop and distance tables for ghost pathfinding, computed once per maze layout.
+
+    Ghost BFS results depend on the start cell, the ghost's heading (the cell behind it
+    is never expanded) and whether it may pass the door, so each table row is keyed by
+    (can_pass_door, start cell, heading) and holds, for every clamped target cell, the
+    first move towards the closest reachable cell. Rows are filled lazily on first use.
+    """
+
+    _cache: Dict[tuple, 'PathTable'] = {}
+
+    def __init__(self, game_map: GameMap):
+        self.width = game_map.width
+        self.height = game_map.height
+
+        size = self.width * self.height
+        topology = game_map.topology
+        self.walkable = topology.walkable
+        self.exit_count = topology.exit_count
+
+        self.next_hop = np.full((2, size, STILL + 1, size), UNKNOWN, dtype=np.int8)
+        self.distance = np.zeros((2, size, STILL + 1, size), dtype=np.int16)
+
+        ys, xs = np.divmod(np.arange(size), self.width)
+        self._target_x = xs
+        self._target_y = ys
+
+    @classmethod
+    def for_map(cls, game_map: GameMap) -> 'PathTable':
+        key = game_map.layout_key()
+        table = cls._cache.get(key)
+
+        if table is None:
+            table = cls._cache[key] = cls(game_map)
+
+        return table
+
+    def get_direction(self, x: int, y: int, direction: Direction, can_pass_door: bool, target: Tuple[int, int]) -> Optional[Direction]:
+        targetX = max(0, min(target[0], self.width - 1))
+        targetY = max(0, min(target[1], self.height - 1))
+
+        door = int(can_pass_door)
+        cell = y * self.width + x
+        heading = HEADINGS.get((direction.x, direction.y), STILL)
+
+        hop = self.next_hop[door, cell, heading, targetY * self.width + targetX]
+        if hop == UNKNOWN:
+            self._fill_row(door, x, y, heading)
+            hop = self.next_hop[door, cell, heading, targetY * self.width + targetX]
+
+        return DIRECTION_MAP[hop] if hop != NO_MOVE else None
+
+    def fill(self):
+        # Ghosts can stand on the door while it is locked, so cover every non-wall cell
+        for door in range(2):
+            for y in range(self.height):
+                for x in range(self.width):
+                    if not self.walkable[1, y, x]:
+                        continue
+                    for heading in range(STILL + 1):
+                        if self.next_hop[door, y * self.width + x, heading, 0] == UNKNOWN:
+                            self._fill_row(door, x, y, heading)
+
+    def _fill_row(self, door: int, x: int, y: int, heading: int):
+        walkable = self.walkable[door].tolist()
+
+        blocked = None
+        if heading != STILL and self.exit_count[door, y, x] != 1:
+            back = DIRECTION_MAP[heading]
+            blocked = (x - back.x, y - back.y)
+
+        order_x, order_y, order_hop, order_dist = [x], [y], [NO_MOVE], [0]
+        visited = {(x, y)}
+
+        i = 0
+        while i < len(order_x):
+            cx, cy, hop, dist = order_x[i], order_y[i], order_hop[i], order_dist[i]
+            i += 1
+
+            for d, direction in enumerate(DIRECTION_MAP):
+                nx, ny = cx + direction.x, cy + direction.y
+
+                if not (0 <= nx < self.width and 0 <= ny < self.height):
+                    continue
+                if not walkable[ny][nx] or (nx, ny) == blocked or (nx, ny) in visited:
+                    continue
+
+                visited.add((nx, ny))
+                order_x.append(nx)
+                order_y.append(ny)
+                order_hop.append(d if hop == NO_MOVE else hop)
+                order_dist.append(dist + 1)
+
+        # BFS keeps the first cell (in visiting order) with the smallest Manhattan
+        # distance to the target, which is exactly what argmin returns
+        manhattan = (
+            np.abs(np.array(order_x)[:, None] - self._target_x[None, :]) +
+            np.abs(np.array(order_y)[:, None] - self._target_y[None, :])
+        )
+        closest = np.argmin(manhattan, axis=0)
+
+        cell = y * self.width + x
+        self.next_hop[door, cell, heading] = np.array(order_hop, dtype=np.int8)[closest]
+        self.distance[door, cell, heading] = np.array(order_dist, dtype=np.int16)[closest]
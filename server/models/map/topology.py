@@ -0,0 +1,110 @@
+from pacman_constants import DIRECTION_MAP
+from models.interfaces import CellType
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+# Heading slot used when a ghost is standing still (or its direction is not one of DIRECTION_MAP)
+STILL = len(DIRECTION_MAP)
+HEADINGS = {(direction.x, direction.y): i for i, direction in enumerate(DIRECTION_MAP)}
+
+class MapTopology:
+    """
+    Static movement data of a maze, computed once per layout: teleport pairs, walkability,
+    per-cell neighbours and legal-move bitmasks for Pac-Man and the ghosts.
+
+    The numpy tables serve the vectorised code; the list mirrors serve per-character
+    lookups, where indexing a Python list is much cheaper than indexing an array.
+    """
+
+    _cache: Dict[tuple, 'MapTopology'] = {}
+
+    def __init__(self, game_map):
+        self.width = game_map.width
+        self.height = game_map.height
+        size = self.width * self.height
+
+        # Pac-Man only ever teleports between the first two border openings
+        self.teleport_points: List[Tuple[int, int]] = game_map.get_teleport_points()
+        self.teleport_pairs: Dict[Tuple[int, int], Tuple[int, int]] = {}
+        if len(self.teleport_points) >= 2:
+            first, second = self.teleport_points[:2]
+            self.teleport_pairs = {first: second, second: first}
+
+        self.walls = game_map.cell_mask(CellType.Wall)
+        self.walkable = np.stack([game_map.walkable_mask(False), game_map.walkable_mask(True)])
+
+        # Neighbour walkability per direction; off-grid cells are walkable (see GameMap.is_walkable)
+        # but ghosts never step onto them
+        open_padded = np.ones((2, self.height + 2, self.width + 2), dtype=bool)
+        open_padded[:, 1:-1, 1:-1] = self.walkable
+        grid_padded = np.zeros_like(open_padded)
+        grid_padded[:, 1:-1, 1:-1] = self.walkable
+        walls_padded = np.zeros((self.height + 2, self.width + 2), dtype=bool)
+        walls_padded[1:-1, 1:-1] = self.walls
+
+        open_to = np.stack([self._shift(open_padded, d).reshape(2, size) for d in DIRECTION_MAP], axis=-1)
+        grid_to = np.stack([self._shift(grid_padded, d).reshape(2, size) for d in DIRECTION_MAP], axis=-1)
+        wall_to = np.stack([self._shift(walls_padded, d).ravel() for d in DIRECTION_MAP], axis=-1)
+
+        self.exit_count = open_to.sum(axis=-1, dtype=np.int8).reshape(2, self.height, self.width)
+        self.neighbours = [[tuple(np.flatnonzero(exits).tolist()) for exits in open_to[door]] for door in range(2)]
+
+        # Bitmask of the moves Ghost._is_valid_position accepts, per heading (a ghost never
+        # turns back unless it is in a dead end), and whether staying put counts as valid
+        single_exit = (self.exit_count == 1).reshape(2, size)
+        self.ghost_moves = np.zeros((2, size, STILL + 1), dtype=np.uint8)
+        self.ghost_can_stay = self.walkable.reshape(2, size) & single_exit
+
+        for d, direction in enumerate(DIRECTION_MAP):
+            for heading, back in enumerate(DIRECTION_MAP):
+                reverse = back.x == -direction.x and back.y == -direction.y
+                allowed = grid_to[..., d] & (single_exit | (not reverse))
+                self.ghost_moves[:, :, heading] |= (allowed << d).astype(np.uint8)
+
+            self.ghost_moves[:, :, STILL] |= (grid_to[..., d] << d).astype(np.uint8)
+
+        # Pac-Man may head anywhere but into a wall, including off the grid
+        self.pacman_moves = np.zeros(size, dtype=np.uint8)
+        for d in range(len(DIRECTION_MAP)):
+            self.pacman_moves |= (~wall_to[:, d] << d).astype(np.uint8)
+
+        self.ghost_move_lists = self._unpack(self.ghost_moves).tolist()
+        self.pacman_move_lists = self._unpack(self.pacman_moves).tolist()
+
+    @classmethod
+    def for_map(cls, game_map) -> 'MapTopology':
+        key = game_map.layout_key()
+        topology = cls._cache.get(key)
+
+        if topology is None:
+            topology = cls._cache[key] = cls(game_map)
+
+        return topology
+
+    def _shift(self, padded: np.ndarray, direction) -> np.ndarray:
+        return padded[..., 1 + direction.y:1 + direction.y + self.height, 1 + direction.x:1 + direction.x + self.width]
+
+    @staticmethod
+    def _unpack(masks: np.ndarray) -> np.ndarray:
+        return (masks[..., None] >> np.arange(len(DIRECTION_MAP), dtype=np.uint8)) & 1
+
+    def exits(self, x: int, y: int, can_pass_door: bool) -> Tuple[int, ...]:
+        """DIRECTION_MAP indices of the walkable neighbours of an in-grid cell."""
+        return self.neighbours[can_pass_door][y * self.width + x]
+
+    def ghost_legal_moves(self, x: int, y: int, direction, can_pass_door: bool) -> List[int]:
+        heading = HEADINGS.get((direction.x, direction.y), STILL)
+        return self.ghost_move_lists[can_pass_door][y * self.width + x][heading]
+
+    def pacman_legal_moves(self, x: int, y: int) -> List[int]:
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self.pacman_move_lists[y * self.width + x]
+
+        # Off the grid only a wall on the edge of the maze can block Pac-Man
+        legal = []
+        for direction in DIRECTION_MAP:
+            nx, ny = x + direction.x, y + direction.y
+            legal.append(int(not (0 <= nx < self.width and 0 <= ny < self.height and self.walls[ny, nx])))
+
+        return legal
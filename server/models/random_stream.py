@@ -0,0 +1,59 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+BLOCK_SIZE = 256
+
+class RandomStream:
+    """
+    Uniform [0, 1) numbers from a Generator, pre-drawn in blocks so a single draw is a
+    list lookup rather than a Generator call. A block is only drawn once the previous one
+    is used up, so the numbers handed out depend on the seed alone, not on when they are
+    asked for.
+    """
+
+    def __init__(self, rng: np.random.Generator, block_size: int = BLOCK_SIZE):
+        self.rng = rng
+        self.block_size = block_size
+
+        self.block = []
+        self.position = 0
+
+    def random(self) -> float:
+        if self.position >= len(self.block):
+            self.block = self.rng.random(self.block_size).tolist()
+            self.position = 0
+
+        value = self.block[self.position]
+        self.position += 1
+        return value
+
+    def choice(self, options: Sequence):
+        return options[int(self.random() * len(options))]
+
+class RandomStreams:
+    """
+    One RandomStream per game of a batch, stored as arrays so any subset of games can draw
+    at once. Game i hands out exactly the numbers RandomStream(rngs[i]) would.
+    """
+
+    def __init__(self, rngs: Sequence[np.random.Generator], block_size: int = BLOCK_SIZE):
+        self.rngs = list(rngs)
+        self.block_size = block_size
+
+        self.blocks = np.zeros((len(self.rngs), block_size), dtype=np.float64)
+        self.positions = np.full(len(self.rngs), block_size, dtype=np.int64)
+
+    def reseed(self, games: np.ndarray, seeds: Sequence[Optional[int]]):
+        for game, seed in zip(games, seeds):
+            self.rngs[game] = np.random.default_rng(seed)
+        self.positions[games] = self.block_size
+
+    def random(self, games: np.ndarray) -> np.ndarray:
+        for game in games[self.positions[games] >= self.block_size]:
+            self.blocks[game] = self.rngs[game].random(self.block_size)
+            self.positions[game] = 0
+
+        values = self.blocks[games, self.positions[games]]
+        self.positions[games] += 1
+        return values
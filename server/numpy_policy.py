@@ -0,0 +1,188 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import argparse
+import zipfile
+import struct
+import json
+import os
+
+POLICY_EXTENSION = ".npz"
+POLICY_FORMAT_VERSION = 1
+
+ACTIVATIONS = {
+    "ReLU": lambda x: np.maximum(x, 0, out=x),
+    "Tanh": lambda x: np.tanh(x, out=x),
+}
+
+def exported_policy_path(model_path: str) -> str:
+    """model_1000_steps.zip -> model_1000_steps.npz, next to the checkpoint."""
+    return os.path.splitext(model_path)[0] + POLICY_EXTENSION
+
+def current_export(model_path: str) -> Optional[str]:
+    """The exported policy of a checkpoint, if there is one at least as new as the checkpoint."""
+    policy_path = exported_policy_path(model_path)
+    try:
+        if os.stat(policy_path).st_mtime_ns >= os.stat(model_path).st_mtime_ns:
+            return policy_path
+    except FileNotFoundError:
+        pass
+    return None
+
+def _memory_map_npz(path: str, names: List[str]) -> Dict[str, np.ndarray]:
+    # np.load ignores mmap_mode for .npz files; the members np.savez writes are stored
+    # uncompressed, so each array can be mapped at its offset inside the archive
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, 'rb') as f:
+        for name in names:
+            info = archive.getinfo(name + ".npy")
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path}: {name} is compressed and cannot be memory-mapped")
+
+            # Name and extra field lengths of the local header, which may differ from the central directory's
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = struct.unpack("<HH", f.read(4))
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            mapped = np.memmap(path, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                               order='F' if fortran_order else 'C')
+            # A plain view keeps the mapping alive without memmap's per-operation overhead
+            arrays[name] = mapped.view(np.ndarray)
+    return arrays
+
+class NumpyPolicy:
+    """
+    Greedy policy of an exported DQN Q-network or QRDQN quantile network, evaluated with
+    NumPy alone. It has the predict() signature of an SB3 model, so PacmanPlayer and
+    play_episodes take either. Loading memory-maps the weights: workers serving the same
+    checkpoint share its pages, and no torch, optimizer state or policy object is built.
+    """
+
+    def __init__(self, layers: List[Tuple[np.ndarray, np.ndarray]], activation: str = "ReLU",
+                 n_quantiles: int = 0, path: Optional[str] = None):
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"Unsupported activation {activation}")
+
+        self.layers = layers  # (weight as (inputs, outputs), bias) per linear layer
+        self.activation = activation
+        self.n_quantiles = n_quantiles
+        self.path = path
+
+        self._activation = ACTIVATIONS[activation]
+        outputs = layers[-1][1].shape[0]
+        self.n_actions = outputs // n_quantiles if n_quantiles else outputs
+
+    @property
+    def input_size(self) -> int:
+        return self.layers[0][0].shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(weight.nbytes + bias.nbytes for weight, bias in self.layers)
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> 'NumpyPolicy':
+        with np.load(path) as npz:
+            meta = json.loads(str(npz["meta"]))
+            if meta["version"] != POLICY_FORMAT_VERSION:
+                raise ValueError(f"{path} is a version {meta['version']} policy, expected {POLICY_FORMAT_VERSION}")
+
+            names = [f"{kind}{i}" for i in range(meta["layers"]) for kind in ("weight", "bias")]
+            arrays = _memory_map_npz(path, names) if mmap else {name: npz[name] for name in names}
+
+        layers = [(arrays[f"weight{i}"], arrays[f"bias{i}"]) for i in range(meta["layers"])]
+        return cls(layers, meta["activation"], meta["n_quantiles"], path)
+
+    def save(self, path: str):
+        arrays = {"meta": np.array(json.dumps({
+            "version": POLICY_FORMAT_VERSION,
+            "layers": len(self.layers),
+            "activation": self.activation,
+            "n_quantiles": self.n_quantiles,
+        }))}
+        for i, (weight, bias) in enumerate(self.layers):
+            arrays[f"weight{i}"] = np.ascontiguousarray(weight, dtype=np.float32)
+            arrays[f"bias{i}"] = np.ascontiguousarray(bias, dtype=np.float32)
+
+        # Written aside and renamed, so a worker never maps a half-written file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    def q_values(self, observations: np.ndarray) -> np.ndarray:
+        """Q-values of a (batch, inputs) observation array; for QRDQN, the mean over quantiles."""
+        x = np.asarray(observations, dtype=np.float32)
+        for weight, bias in self.layers[:-1]:
+            x = self._activation(x @ weight + bias)
+
+        weight, bias = self.layers[-1]
+        x = x @ weight + bias
+        if self.n_quantiles:
+            x = x.reshape(len(x), self.n_quantiles, self.n_actions).mean(axis=1)
+        return x
+
+    def predict(self, observation: np.ndarray, state=None, episode_start=None,
+                deterministic: bool = True) -> Tuple[np.ndarray, None]:
+        # Always greedy: serving and evaluation only ever ask for deterministic actions
+        observation = np.asarray(observation, dtype=np.float32)
+        actions = self.q_values(observation.reshape(-1, self.input_size)).argmax(axis=1)
+        return (actions[0] if observation.ndim == 1 else actions), None
+
+def export_policy(model_path: str, output_path: Optional[str] = None) -> str:
+    """Writes the Q-network (or quantile network) of an SB3 checkpoint as an uncompressed .npz."""
+    # The only place torch is needed: reading the checkpoint being exported
+    from stable_baselines3.common.torch_layers import FlattenExtractor
+    from model_cache import load_checkpoint
+    from torch import nn
+
+    model = load_checkpoint(model_path)
+    policy = model.policy
+
+    if hasattr(policy, "quantile_net"):
+        network, n_quantiles = policy.quantile_net, policy.quantile_net.n_quantiles
+        sequential = network.quantile_net
+    else:
+        network, n_quantiles = policy.q_net, 0
+        sequential = network.q_net
+
+    if not isinstance(network.features_extractor, FlattenExtractor):
+        raise ValueError(f"{model_path}: only flat observations can be exported")
+
+    layers = [
+        (module.weight.detach().cpu().numpy().T, module.bias.detach().cpu().numpy())
+        for module in sequential if isinstance(module, nn.Linear)
+    ]
+    output_path = output_path or exported_policy_path(model_path)
+    NumpyPolicy(layers, policy.activation_fn.__name__, n_quantiles).save(output_path)
+    return output_path
+
+def _checkpoint_paths(paths: List[str]) -> List[str]:
+    model_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, filenames in os.walk(path):
+                model_paths.extend(os.path.join(directory, name) for name in sorted(filenames) if name.endswith(".zip"))
+        else:
+            model_paths.append(path)
+    return model_paths
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export checkpoints as NumPy policies for serving")
+    parser.add_argument("paths", nargs="+", help="checkpoint .zip files, or directories such as agents/dqn/<model>")
+    parser.add_argument("--force", action="store_true", help="re-export checkpoints whose export is up to date")
+    args = parser.parse_args()
+
+    for model_path in _checkpoint_paths(args.paths):
+        if not args.force and current_export(model_path):
+            continue
+        try:
+            print(f"{model_path} -> {export_policy(model_path)}")
+        except Exception as e:
+            print(f"Could not export {model_path}: {e}")
@@ -1,5 +1,8 @@
 from models.interfaces import Direction
 
+# Bump whenever a change to the game makes old episodes unreproducible (cached replays are keyed by it)
+ENV_VERSION = 3
+
 GAME_MAP = [
     [1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1,1],
     [1,0,0,0,0,0,0,0,0,1,0,0,0,0,0,0,0,0,1],
@@ -27,4 +30,16 @@ DIRECTION_MAP = [
     Direction(0, 1),  # Down
     Direction(-1, 0), # Left
     Direction(1, 0)   # Right
-]
\ No newline at end of file
+]
+
+# Flat observation layout (field name, shape), in the order fields are concatenated
+OBSERVATION_FIELDS = [
+    ('pacman', (2,)),
+    ('ghosts', (4, 6)),
+    ('power_pellets', (4, 3)),
+    ('nearest_dots', (4, 3)),
+    ('dots_left', (1,)),
+    ('dots_eaten_percentage', (1,)),
+    ('pacman_legal_moves', (4,)),
+    ('ghost_legal_moves', (4, 5)),
+]
@@ -1,19 +1,36 @@
 from models.characters.ghost import Ghost, Blinky, Inky, Pinky, Clyde
-from pacman_constants import GAME_MAP, DIRECTION_MAP
+from pacman_constants import GAME_MAP, DIRECTION_MAP, OBSERVATION_FIELDS
 from models.interfaces import CellType, Direction
 from models.characters.ghost import GhostState
 from models.characters.pacman import Pacman
-from models.map.game_map import GameMap
+from models.map.dot_index import DotIndex
+from models.map.topology import HEADINGS, STILL
+from models.random_stream import RandomStream, BLOCK_SIZE
+from models.map.game_map import MapTemplate
+from step_profiler import StepProfiler
 
 from collections import deque
 from gymnasium import spaces
-from copy import deepcopy
+from typing import Optional
 
 import gymnasium as gym
 import numpy as np
 
+MAP_TEMPLATE = MapTemplate(GAME_MAP)
+
+# Directions by heading index as stored in state records, STILL last
+DIRECTIONS = list(DIRECTION_MAP) + [Direction(0, 0)]
+GHOST_STATES = tuple(GhostState)
+MASK_64 = (1 << 64) - 1
+
+# Integer ghost fields of a state record, in column order
+GHOST_FIELDS = (
+    'gridX', 'gridY', 'direction', 'next_direction', 'state', 'previous_state', 'last_state_change',
+    'last_move_time', 'cycle_index', 'respawn_start_time', 'respawn_duration', 'door_locked', 'is_game_over'
+)
+
 class PacmanEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, obs_buffer: Optional[np.ndarray] = None):
         super(PacmanEnv, self).__init__()
         
         # Action space: 4 possible moves [up, down, left, right] 
@@ -58,53 +75,226 @@ class PacmanEnv(gym.Env):
             dtype=np.float32
         )
         
-        self.prev_pacman_pos = (0, 0)
-        self.prev_ghost_positions = []
+        # Observations are written in place into one flat buffer through per-field views.
+        # A caller-provided buffer (e.g. a row of a batch) is filled directly and returned
+        # as is; otherwise step/reset return a copy of the env's own buffer.
+        self.set_observation_buffer(obs_buffer)
         
-        self.reset()
-    
-    def reset(self, **kwargs):
-        self.game_map = GameMap(deepcopy(GAME_MAP))
+        self.game_map = MAP_TEMPLATE.instantiate()
         self.pacman = Pacman(self.game_map, 9, 15)
-        
-        self.total_initial_dots = sum([
-            self.game_map.get_cell(i, j) in [CellType.Dot, CellType.PowerPellet]
-            for i in range(self.game_map.height)
-            for j in range(self.game_map.width)
-        ])
-        
         self.ghosts = [
             Blinky(9, 8, self.game_map),
             Clyde(8, 9, self.game_map),
             Inky(10, 9, self.game_map),
             Pinky(9, 9, self.game_map)
         ]
+        self.dots = DotIndex(self.game_map)
+        self.total_initial_dots = MAP_TEMPLATE.total_dots
+        
+        # For detecting oscillation
+        self.position_history = deque(maxlen=8)  # Track the last 6 positions
+        self.action_history = deque(maxlen=8)    # Track the last 6 actions
+        
+        self.prev_pacman_pos = (0, 0)
+        self.prev_ghost_positions = []
+        
+        # Layout of get_state() records; fixed for the lifetime of the env
+        self.state_dtype = np.dtype([
+            ('cells', np.uint8, (MAP_TEMPLATE.width * MAP_TEMPLATE.height,)),
+            ('dots_alive', bool, (len(self.dots.alive),)),
+            ('counters', np.int64, (5,)),             # score, current_time, ghost_streak, game_over, dots remaining
+            ('pacman', np.int64, (6,)),               # x, y, direction, next_direction, last_move_time, is_game_over
+            ('ghosts', np.int64, (len(self.ghosts), len(GHOST_FIELDS))),
+            ('ghost_move_intervals', np.float64, (len(self.ghosts),)),
+            ('prev_positions', np.int64, (1 + len(self.ghosts), 2)),
+            ('position_history', np.int64, (8, 2)),
+            ('action_history', np.int64, (8,)),
+            ('history_lengths', np.int64, (2,)),
+            ('rng_state', np.uint64, (4,)),           # PCG64 state and increment, high and low words
+            ('rng_uint32', np.uint64, (2,)),          # has_uint32, uinteger
+            ('rng_block', np.float64, (BLOCK_SIZE,)), # pre-drawn numbers of the random stream
+            ('rng_position', np.int64),               # next unused number in rng_block
+        ])
+        
+        self.random_stream = None
+        self.profiler: Optional[StepProfiler] = None
+        self.reset()
+    
+    def set_observation_buffer(self, obs_buffer: Optional[np.ndarray] = None):
+        self._external_obs_buffer = obs_buffer is not None
+        
+        if obs_buffer is None:
+            obs_buffer = np.zeros(self.observation_space.shape, dtype=np.float32)
+        elif obs_buffer.shape != self.observation_space.shape or obs_buffer.dtype != np.float32:
+            raise ValueError(f"Observation buffer must be float32 with shape {self.observation_space.shape}")
+        
+        self._obs = obs_buffer
+        self.obs_fields = {}
+        
+        offset = 0
+        for name, shape in OBSERVATION_FIELDS:
+            size = int(np.prod(shape))
+            self.obs_fields[name] = obs_buffer[offset:offset + size].reshape(shape)
+            offset += size
+    
+    def reset(self, seed: Optional[int] = None, options: Optional[dict] = None):
+        # Seeds self.np_random; the ghosts draw from it through a shared random stream,
+        # which carries on across unseeded resets like the generator itself
+        super().reset(seed=seed)
+        if seed is not None or self.random_stream is None:
+            self.random_stream = RandomStream(self.np_random)
+            for ghost in self.ghosts:
+                ghost.rng = self.random_stream
+        
+        self._reset_level()
         
-        self.dots = self.game_map.get_dots()
         self.game_over = False
         self.score  = 0
 
         self.ghost_streak = 200
         self.current_time = 0
         
-        # Store previous position for position change penalty
-        self.prev_pacman_pos = (self.pacman.gridX, self.pacman.gridY)
+        self.prev_ghost_positions = [(g.gridX, g.gridY) for g in self.ghosts]
         
-        # For detecting oscillation
-        self.position_history = deque(maxlen=8)  # Track the last 6 positions
-        self.action_history = deque(maxlen=8)    # Track the last 6 actions
+        return self._observation(), self._get_info()
+    
+    def _reset_level(self):
+        # Restores the map, characters and dot set in place, without rebuilding them
+        self.game_map.restore(MAP_TEMPLATE)
+        self.pacman.reset()
+        for ghost in self.ghosts:
+            ghost.reset()
+        self.dots.reset()
         
+        self.position_history.clear()
+        self.action_history.clear()
+        
+        # Store previous position for position change penalty
         self.prev_pacman_pos = (self.pacman.gridX, self.pacman.gridY)
-        self.prev_ghost_positions = [(g.gridX, g.gridY) for g in self.ghosts]
+    
+    def get_state(self) -> np.ndarray:
+        """
+        Snapshot of the full game state as a fixed-layout record (a 0-d structured array),
+        including the env's RNG and the pre-drawn numbers the ghosts draw from. Restoring it with
+        set_state() continues the game exactly as the original would.
+        """
+        state = np.zeros((), dtype=self.state_dtype)
+        pacman = self.pacman
+        
+        state['cells'] = self.game_map.grid.ravel()
+        state['dots_alive'] = self.dots.alive
+        state['counters'] = (self.score, self.current_time, self.ghost_streak, self.game_over, self.dots.remaining)
+        state['pacman'] = (
+            pacman.gridX, pacman.gridY, HEADINGS.get((pacman.direction.x, pacman.direction.y), STILL),
+            HEADINGS.get((pacman.next_direction.x, pacman.next_direction.y), STILL), pacman.last_move_time, pacman.is_game_over
+        )
+        
+        state['ghosts'] = [
+            (
+                ghost.gridX, ghost.gridY, HEADINGS.get((ghost.direction.x, ghost.direction.y), STILL),
+                HEADINGS.get((ghost.next_direction.x, ghost.next_direction.y), STILL), ghost.state.value,
+                ghost.previous_state.value, ghost.last_state_change, ghost.last_move_time, ghost.cycle_index,
+                ghost.respawn_start_time, ghost.respawn_duration, ghost.door_locked, ghost.is_game_over
+            )
+            for ghost in self.ghosts
+        ]
+        state['ghost_move_intervals'] = [ghost.move_interval for ghost in self.ghosts]
+        
+        state['prev_positions'] = [self.prev_pacman_pos, *(self.prev_ghost_positions or [(0, 0)] * len(self.ghosts))]
+        state['history_lengths'] = (len(self.position_history), len(self.action_history))
+        if self.position_history:
+            state['position_history'][:len(self.position_history)] = self.position_history
+        if self.action_history:
+            state['action_history'][:len(self.action_history)] = self.action_history
+        
+        rng_state = self.np_random.bit_generator.state
+        pcg_state, pcg_inc = rng_state['state']['state'], rng_state['state']['inc']
+        state['rng_state'] = (pcg_state >> 64, pcg_state & MASK_64, pcg_inc >> 64, pcg_inc & MASK_64)
+        state['rng_uint32'] = (rng_state['has_uint32'], rng_state['uinteger'])
+        
+        stream = self.random_stream
+        unused = len(stream.block) - stream.position
+        state['rng_block'][BLOCK_SIZE - unused:] = stream.block[stream.position:]
+        state['rng_position'] = BLOCK_SIZE - unused
+        
+        return state
+    
+    def set_state(self, state: np.ndarray):
+        """Restores a record taken by get_state(); the observation is not recomputed."""
+        if state.dtype != self.state_dtype:
+            raise ValueError("State record does not match this environment's layout")
+        
+        self.game_map._cells[:] = state['cells'].tobytes()
+        self.dots.alive[:] = state['dots_alive']
+        
+        self.score, self.current_time, self.ghost_streak, game_over, self.dots.remaining = state['counters'].tolist()
+        self.game_over = bool(game_over)
+        
+        pacman = self.pacman
+        pacman.gridX, pacman.gridY, direction, next_direction, pacman.last_move_time, is_game_over = state['pacman'].tolist()
+        pacman.direction, pacman.next_direction = DIRECTIONS[direction], DIRECTIONS[next_direction]
+        pacman.is_game_over = bool(is_game_over)
+        
+        for ghost, row, move_interval in zip(self.ghosts, state['ghosts'].tolist(), state['ghost_move_intervals'].tolist()):
+            (
+                ghost.gridX, ghost.gridY, direction, next_direction, ghost_state, previous_state, ghost.last_state_change,
+                ghost.last_move_time, ghost.cycle_index, ghost.respawn_start_time, ghost.respawn_duration, door_locked, is_game_over
+            ) = row
+            
+            ghost.direction, ghost.next_direction = DIRECTIONS[direction], DIRECTIONS[next_direction]
+            ghost.state, ghost.previous_state = GHOST_STATES[ghost_state], GHOST_STATES[previous_state]
+            ghost.door_locked, ghost.is_game_over = bool(door_locked), bool(is_game_over)
+            ghost.move_interval = move_interval
+        
+        prev_positions = [tuple(position) for position in state['prev_positions'].tolist()]
+        self.prev_pacman_pos, self.prev_ghost_positions = prev_positions[0], prev_positions[1:]
+        
+        positions, actions = state['history_lengths'].tolist()
+        self.position_history.clear()
+        self.position_history.extend(tuple(position) for position in state['position_history'][:positions].tolist())
+        self.action_history.clear()
+        self.action_history.extend(state['action_history'][:actions].tolist())
+        
+        state_high, state_low, inc_high, inc_low = state['rng_state'].tolist()
+        has_uint32, uinteger = state['rng_uint32'].tolist()
+        self.np_random.bit_generator.state = {
+            'bit_generator': 'PCG64',
+            'state': {'state': state_high << 64 | state_low, 'inc': inc_high << 64 | inc_low},
+            'has_uint32': has_uint32,
+            'uinteger': uinteger,
+        }
         
-        return self._flatten_observation(self._get_obs()), self._get_info()
+        self.random_stream = RandomStream(self.np_random)
+        self.random_stream.block = state['rng_block'].tolist()
+        self.random_stream.position = int(state['rng_position'])
+        for ghost in self.ghosts:
+            ghost.rng = self.random_stream
+    
+    def enable_profiling(self):
+        """
+        Starts timing the phases of step(); an env that never enables it pays nothing.
+        Returns nothing, so it can be called through VecEnv.env_method() on worker envs.
+        """
+        if self.profiler is None:
+            self.profiler = StepProfiler(self)
+            self.profiler.install()
     
-    def _flatten_observation(self, obs_dict):
-        return np.array([val for key in obs_dict for val in obs_dict[key].flatten()], dtype=np.float32)
+    def disable_profiling(self):
+        if self.profiler is not None:
+            self.profiler.uninstall()
+            self.profiler = None
+    
+    def step_profile(self) -> dict:
+        """Per-phase timings since profiling was enabled (see StepProfiler.report); empty when disabled."""
+        return self.profiler.report() if self.profiler is not None else {}
+    
+    def _observation(self) -> np.ndarray:
+        self._get_obs()
+        return self._obs if self._external_obs_buffer else self._obs.copy()
     
     def step(self, action: int):
         if self.game_over:
-            return self._flatten_observation(self._get_obs()), -250, True, False, self._get_info()
+            return self._observation(), -250, True, False, self._get_info()
         
         self.prev_pacman_pos = (self.pacman.gridX, self.pacman.gridY)
         self.prev_ghost_positions = [(g.gridX, g.gridY) for g in self.ghosts]
@@ -139,59 +329,31 @@ class PacmanEnv(gym.Env):
         
         # Reset level if completed
         if level_completed:
-            self.game_map = GameMap(deepcopy(GAME_MAP))
-            self.pacman = Pacman(self.game_map, 9, 15)
-            self.ghosts = [
-                Blinky(9, 8, self.game_map),
-                Clyde(8, 9, self.game_map),
-                Inky(10, 9, self.game_map),
-                Pinky(9, 9, self.game_map)
-            ]
-            self.dots = self.game_map.get_dots()
-            self.prev_pacman_pos = (self.pacman.gridX, self.pacman.gridY)
-            self.position_history.clear()
-            self.action_history.clear()
+            self._reset_level()
         
         reward = self._calculate_reward(old_score, ghost_collision, ghost_eaten, terminated)
-        obs = self._flatten_observation(self._get_obs())
+        obs = self._observation()
         
         return obs, reward, terminated, truncated, self._get_info()
     
     def _get_obs(self):
-        pacman_pos = np.array([self.pacman.gridX, self.pacman.gridY], dtype=np.int32)
-        
-        pacman_legal_moves = np.zeros(4, dtype=np.int32)
-        for i, direction in enumerate(DIRECTION_MAP):
-            next_x = self.pacman.gridX + direction.x
-            next_y = self.pacman.gridY + direction.y
-            
-            teleport_points, is_teleport = self.game_map.get_teleport_points(), False            
-            if teleport_points and len(teleport_points) >= 2:
-                current_pos = (self.pacman.gridX, self.pacman.gridY)
-                if (next_x < 0 or next_x >= self.game_map.width) and current_pos in teleport_points:
-                    is_teleport = True
-            
-            if not self.game_map.get_cell(next_x, next_y) == CellType.Wall or is_teleport:
-                pacman_legal_moves[i] = 1
+        fields = self.obs_fields
+        max_possible_dist = self.game_map.width + self.game_map.height
         
-        ghosts_legal_moves = np.zeros((4, 5), dtype=np.int32)
-        for i, ghost in enumerate(self.ghosts):
-            for j, direction in enumerate(DIRECTION_MAP):
-                next_x = ghost.gridX + direction.x
-                next_y = ghost.gridY + direction.y
-                
-                if ghost._is_valid_position(next_x, next_y):
-                    ghosts_legal_moves[i][j] = 1
+        fields['pacman'][:] = (self.pacman.gridX, self.pacman.gridY)
         
-            ghosts_legal_moves[i][4] = ghost.type.value
+        fields['pacman_legal_moves'][:] = self.game_map.topology.pacman_legal_moves(self.pacman.gridX, self.pacman.gridY)
         
-        ghosts_data = np.zeros((4, 6), dtype=np.float32)
+        ghost_legal_moves = fields['ghost_legal_moves']
+        for i, ghost in enumerate(self.ghosts):
+            ghost_legal_moves[i, :4] = ghost.legal_moves()
+            ghost_legal_moves[i, 4] = ghost.type.value
         
+        ghosts_data = fields['ghosts']
         for i, ghost in enumerate(self.ghosts):
             frightened_timer = max(0, 7000 - (self.current_time - ghost.last_state_change)) if ghost.state == GhostState.FRIGHTENED else 0
             
             manhattan_dist = abs(ghost.gridX - self.pacman.gridX) + abs(ghost.gridY - self.pacman.gridY)
-            max_possible_dist = self.game_map.width + self.game_map.height
             normalized_dist = min(1.0, manhattan_dist / max_possible_dist)
             
             ghosts_data[i] = [
@@ -203,43 +365,23 @@ class PacmanEnv(gym.Env):
                 normalized_dist
             ]
         
-        power_pellets = np.zeros((4, 3), dtype=np.float32)
-        power_pellet_count = 0
-        max_possible_dist = self.game_map.width + self.game_map.height
-        
-        for dot in self.dots:
-            if dot.type == CellType.PowerPellet and power_pellet_count < 4:
-                manhattan_dist = abs(dot.gridX - self.pacman.gridX) + abs(dot.gridY - self.pacman.gridY)
-                normalized_dist = min(1.0, manhattan_dist / max_possible_dist)
-                power_pellets[power_pellet_count] = [dot.gridX, dot.gridY, normalized_dist]
-                power_pellet_count += 1
+        power_pellets = fields['power_pellets']
+        power_pellets.fill(0)
         
-        dot_distances = []
-        
-        for dot in self.dots:
-            if dot.type == CellType.Dot:
-                manhattan_dist = abs(dot.gridX - self.pacman.gridX) + abs(dot.gridY - self.pacman.gridY)
-                dot_distances.append((dot.gridX, dot.gridY, manhattan_dist))
-        
-        dot_distances.sort(key=lambda x: x[2])
+        for i, dot in enumerate(self.dots.power_pellets(4)):
+            manhattan_dist = abs(dot.gridX - self.pacman.gridX) + abs(dot.gridY - self.pacman.gridY)
+            normalized_dist = min(1.0, manhattan_dist / max_possible_dist)
+            power_pellets[i] = [dot.gridX, dot.gridY, normalized_dist]
         
-        nearest_dots = np.zeros((4, 3), dtype=np.int32)
-        for i in range(min(4, len(dot_distances))):
-            nearest_dots[i] = dot_distances[i]
+        nearest = self.dots.nearest(self.pacman.gridX, self.pacman.gridY, 4)
+        nearest_dots = fields['nearest_dots']
+        nearest_dots.fill(0)
+        nearest_dots[:len(nearest)] = nearest
         
-        dots_left = np.array([len(self.dots)], dtype=np.int32)
-        dots_eaten_percentage = np.array([1 - len(self.dots) / self.total_initial_dots], dtype=np.float32)
+        fields['dots_left'][0] = len(self.dots)
+        fields['dots_eaten_percentage'][0] = 1 - len(self.dots) / self.total_initial_dots
         
-        return {
-            'pacman': pacman_pos,
-            'ghosts': ghosts_data,
-            'power_pellets': power_pellets,
-            'nearest_dots': nearest_dots,
-            'dots_left': dots_left,
-            'dots_eaten_percentage': dots_eaten_percentage,
-            'pacman_legal_moves': pacman_legal_moves,
-            'ghost_legal_moves': ghosts_legal_moves,
-        }
+        return fields
         
     def _get_game_state(self):
         return {
@@ -259,28 +401,19 @@ class PacmanEnv(gym.Env):
         }
         
     def _check_dot_collision(self):
-        pacman_pos = (self.pacman.gridX, self.pacman.gridY)
-        
-        new_dots = []
-        dot_eaten = False
-        pellet_eaten = False
-        
-        for dot in self.dots:
-            if (dot.gridX, dot.gridY) == pacman_pos:
-                if dot.type == CellType.Dot:
-                    self.score += 10
-                    dot_eaten = True
-                else:
-                    self.score += 50
-                    pellet_eaten = True
-                    self.ghost_streak = 200
-                    for ghost in self.ghosts:
-                        ghost.enter_frightened_state(self.current_time)
-                self.game_map.set_cell(dot.gridX, dot.gridY, CellType.Empty)
-            else:
-                new_dots.append(dot)
-        
-        self.dots = new_dots
+        dot = self.dots.remove(self.pacman.gridX, self.pacman.gridY)
+        if dot is None:
+            return
+        
+        if dot.type == CellType.Dot:
+            self.score += 10
+        else:
+            self.score += 50
+            self.ghost_streak = 200
+            for ghost in self.ghosts:
+                ghost.enter_frightened_state(self.current_time)
+        
+        self.game_map.set_cell(dot.gridX, dot.gridY, CellType.Empty)
         
     def _check_ghost_collision(self):
         ghost_collision, ghost_eaten = False, False
@@ -1,33 +1,74 @@
-from stable_baselines3.common.env_util import make_vec_env
-from gymnasium.wrappers import FlattenObservation
-from stable_baselines3 import DQN
-from sb3_contrib import QRDQN
+from typing import TYPE_CHECKING, Iterator, List, Optional, Union
+from numpy_policy import NumpyPolicy
+from model_cache import load_model
 from pacman_env import PacmanEnv
 
 import numpy as np
 import json
 import os
 
+if TYPE_CHECKING:
+    from stable_baselines3.common.base_class import BaseAlgorithm
+
+# An SB3 model or its NumPy export; both have predict()
+Policy = Union['BaseAlgorithm', NumpyPolicy]
+
+def play_episodes(model: Policy, num_episodes: int, seed: Optional[int] = None) -> List[dict]:
+    """
+    Plays episodes seeded seed, seed + 1, ... in lockstep on a BatchedPacmanEnv, with one
+    policy call per step for all unfinished episodes. Returns their terminal infos, which
+    hold the final score and the Monitor-style 'episode' stats.
+    """
+    # BatchedPacmanEnv is an SB3 VecEnv, which imports torch; single episodes never need it
+    from batched_pacman_env import BatchedPacmanEnv
+
+    env = BatchedPacmanEnv(num_episodes, seed=seed)
+    obs = env.reset()
+
+    terminal_infos: List[dict] = [{} for _ in range(num_episodes)]
+    running = np.ones(num_episodes, dtype=bool)
+    actions = np.zeros(num_episodes, dtype=np.int64)
+
+    while running.any():
+        actions[running], _ = model.predict(obs[running], deterministic=True)
+        obs, _, dones, infos = env.step(actions)
+
+        # Finished games are reset by the env and keep playing, but are no longer asked for actions
+        for i in np.flatnonzero(running & dones):
+            terminal_infos[i] = infos[i]
+        running &= ~dones
+
+    return terminal_infos
+
 class PacmanPlayer:
-    def __init__(self, model_path: str):
-        self.eval_env = FlattenObservation(PacmanEnv())
+    def __init__(self, model_path: str, model: Optional[Policy] = None):
+        self.eval_env = PacmanEnv()
         self.model_path = model_path if model_path.endswith('.zip') else model_path + '.zip'
-        self.model = QRDQN.load(self.model_path) if 'qrdqn' in self.model_path.lower() else DQN.load(self.model_path)
+        self.model = model if model is not None else load_model(self.model_path)
         
-    def play(self, num_episodes=1):
-        results = []
-
-        for _ in range(num_episodes):
-            obs, info = self.eval_env.reset()
-            done, terminated = False, False
-            episode_result = [info]
+    def frames(self, seed: Optional[int] = None) -> Iterator[dict]:
+        """Plays one episode, yielding the info dict of every step as soon as it is taken."""
+        obs, info = self.eval_env.reset(seed=seed)
+        done, terminated = False, False
+        yield info
 
-            while not done and not terminated:
-                action, _ = self.model.predict(obs, deterministic=True)
-                obs, _, done, terminated, info = self.eval_env.step(action)
-                episode_result.append(info)
-
-            results.append(episode_result)
+        while not done and not terminated:
+            action, _ = self.model.predict(obs, deterministic=True)
+            obs, _, done, terminated, info = self.eval_env.step(action)
+            yield info
+    
+    def scores(self, num_episodes: int, seed: int) -> np.ndarray:
+        """Final scores of episodes seeded seed, seed + 1, ..., played in lockstep."""
+        return np.array([info['score'] for info in play_episodes(self.model, num_episodes, seed)])
+        
+    def play(self, num_episodes=1, seed: Optional[int] = None):
+        # Episode i is seeded with seed + i, so a seeded call is reproducible
+        if num_episodes == 1:
+            return list(self.frames(seed))
+        
+        if seed is None:
+            seed = int(np.random.default_rng().integers(2**31))
 
-        best_result_index = np.argmax([episode[-1]["score"] for episode in results])
-        return results[best_result_index]
+        # Only the best episode is recorded frame by frame
+        best_result_index = int(np.argmax(self.scores(num_episodes, seed)))
+        return list(self.frames(seed + best_result_index))
@@ -1,17 +1,44 @@
-from stable_baselines3.common.callbacks import EvalCallback, CheckpointCallback
+from checkpoint_retention_callback import RetentionCheckpointCallback
+from stable_baselines3.common.callbacks import EvalCallback
 from stable_baselines3.common.env_util import make_vec_env
-from gymnasium.wrappers import FlattenObservation
+from shared_memory_vec_env import SharedMemoryVecEnv
+from batched_pacman_env import BatchedPacmanEnv
+from stable_baselines3.common.vec_env import VecEnv
+from stable_baselines3.common.monitor import Monitor
+from async_eval_callback import AsyncEvalCallback
 from plotting_callback import PlottingCallback 
 from pacman_env import PacmanEnv
+from typing import Optional
 
 import numpy as np
+import argparse
 import json
 import sys
 import os
 
+VEC_ENV_KINDS = ("dummy", "shared_memory", "batched")
+
+def make_training_env(kind: str = "dummy", n_envs: Optional[int] = None) -> VecEnv:
+    # "dummy" steps every env in the learner process; "shared_memory" spreads them over
+    # worker processes, one per core the learner leaves free, and sizes n_envs to match;
+    # "batched" steps n_envs games together as numpy arrays in the learner process
+    if kind == "batched":
+        return BatchedPacmanEnv(n_envs or 256)
+    if kind == "shared_memory":
+        return SharedMemoryVecEnv.for_cores(lambda: Monitor(PacmanEnv()), n_envs)
+    return make_vec_env(lambda: PacmanEnv(), n_envs=n_envs or 4)
+
+def parse_training_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model_name")
+    parser.add_argument("--vec-env", choices=VEC_ENV_KINDS, default="dummy")
+    parser.add_argument("--n-envs", type=int, default=None, help="defaults to 4, 4 per worker with shared_memory, or 256 with batched")
+    return parser.parse_args()
+
 class PacmanTrainer:
-    def __init__(self, model, total_timesteps: int, path: str, model_name: str):
-        self.eval_env = FlattenObservation(PacmanEnv())
+    def __init__(self, model, total_timesteps: int, path: str, model_name: str, async_eval: bool = False):
+        self.eval_env = PacmanEnv()
+        self.async_eval = async_eval
         
         self.total_timesteps = total_timesteps
         self.model_name = model_name
@@ -21,19 +48,32 @@ class PacmanTrainer:
         os.makedirs(self.path, exist_ok=True)
 
     def train(self):
-        eval_callback = EvalCallback(
-            self.eval_env,
-            eval_freq=20_000,
-            best_model_save_path=self.path,
-            verbose=1,
-            n_eval_episodes=100,
-            deterministic=True
-        )
+        if self.async_eval:
+            # Evaluates weight snapshots in a separate process, so the learner never waits for it
+            eval_callback = AsyncEvalCallback(
+                eval_freq=20_000,
+                best_model_save_path=self.path,
+                log_path=self.path,
+                verbose=1,
+                n_eval_episodes=100,
+            )
+        else:
+            eval_callback = EvalCallback(
+                self.eval_env,
+                eval_freq=20_000,
+                best_model_save_path=self.path,
+                verbose=1,
+                n_eval_episodes=100,
+                deterministic=True
+            )
         
-        checkpoint_callback = CheckpointCallback(
+        # Keeps a bounded, log-spaced set of checkpoints listed in checkpoints/manifest.json
+        checkpoint_callback = RetentionCheckpointCallback(
             save_freq=60_000,
             save_path=os.path.join(self.path, "checkpoints"),
             name_prefix="model",
+            # With async_eval this is the score of weights at least one eval_freq older
+            eval_score=lambda: eval_callback.last_mean_reward,
             verbose=1
         )
         
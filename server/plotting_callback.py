@@ -1,90 +1,225 @@
 from stable_baselines3.common.callbacks import BaseCallback
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from metrics_log import MetricsLog, read_episodes
+from matplotlib.figure import Figure
+from typing import Optional
 
-import matplotlib.pyplot as plt
 import numpy as np
-import matplotlib
+import threading
+import time
 import os
 
-matplotlib.use('Agg')
+# Longer series are drawn as at most this many per-bin means
+MAX_PLOT_POINTS = 5_000
+# Log records read per chunk when the plots catch up with the log
+READ_CHUNK_EPISODES = 100_000
+
+class BinnedSeries:
+    """
+    Per-bin sums and counts of a growing series, in at most `max_bins` bins of `width`
+    consecutive values. When the bins fill up, neighbouring pairs merge and the width
+    doubles, so memory stays constant however long the series gets.
+    """
+
+    def __init__(self, max_bins: int = MAX_PLOT_POINTS):
+        self.sums = np.zeros(max_bins + max_bins % 2, dtype=np.float64)
+        self.counts = np.zeros(len(self.sums), dtype=np.int64)
+        self.width = 1
+        self.count = 0
+
+    def extend(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        while len(values):
+            room = len(self.sums) * self.width - self.count
+            if room == 0:
+                self._merge()
+                continue
+
+            head, values = values[:room], values[room:]
+            first = self.count // self.width
+            bins = (self.count + np.arange(len(head))) // self.width - first
+            self.sums[first:first + bins[-1] + 1] += np.bincount(bins, weights=head)
+            self.counts[first:first + bins[-1] + 1] += np.bincount(bins)
+            self.count += len(head)
+
+    def _merge(self):
+        half = len(self.sums) // 2
+        self.sums[:half] = self.sums[0::2] + self.sums[1::2]
+        self.counts[:half] = self.counts[0::2] + self.counts[1::2]
+        self.sums[half:] = 0
+        self.counts[half:] = 0
+        self.width *= 2
+
+    def points(self):
+        """Mean 1-based position and mean value of each non-empty bin."""
+        used = -(-self.count // self.width)
+        counts = self.counts[:used]
+        return np.arange(used) * self.width + (counts + 1) / 2, self.sums[:used] / counts
+
+def _save_figure(figure: Figure, path: str):
+    # Written aside and renamed, so the server never serves a half-written plot
+    FigureCanvasAgg(figure)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    figure.savefig(tmp_path, format="png")
+    os.replace(tmp_path, path)
+
+def _line_plot(path: str, series: BinnedSeries, title: str, ylabel: str):
+    figure = Figure(figsize=(10, 5))
+    axes = figure.add_subplot()
+    axes.plot(*series.points())
+    axes.set_title(title)
+    axes.set_xlabel("Episode")
+    axes.set_ylabel(ylabel)
+    axes.grid(True)
+    _save_figure(figure, path)
+
+def render_plots(save_path: str, rewards: BinnedSeries, lengths: BinnedSeries, action_counts: np.ndarray):
+    """Draws the training plots; uses no pyplot state, so any thread may call it."""
+    _line_plot(os.path.join(save_path, "rewards_plot.png"), rewards, "Episode Rewards", "Reward")
+    _line_plot(os.path.join(save_path, "lengths_plot.png"), lengths, "Episode Lengths", "Length")
+
+    full_actions = [0, 1, 2, 3]
+    full_labels = ["up", "down", "left", "right"]
+
+    figure = Figure(figsize=(10, 5))
+    axes = figure.add_subplot()
+    axes.bar(full_actions, action_counts[:len(full_actions)], tick_label=full_labels)
+    axes.set_title("Action Distribution")
+    axes.set_xlabel("Action")
+    axes.set_ylabel("Frequency")
+    axes.grid(True)
+    _save_figure(figure, os.path.join(save_path, "action_distribution.png"))
+
+class PlotRefresher(threading.Thread):
+    """Background thread running `render` when asked, at most once every `min_interval` seconds."""
+
+    def __init__(self, render, min_interval: float):
+        super().__init__(name="plot-refresher", daemon=True)
+        self.render = render
+        self.min_interval = min_interval
+
+        self._requested = threading.Event()
+        self._stopping = threading.Event()
+
+    def request(self):
+        self._requested.set()
+
+    def stop(self):
+        self._stopping.set()
+        self._requested.set()
+        self.join()
+
+    def run(self):
+        last_render = -float("inf")
+        while True:
+            self._requested.wait()
+            if self._stopping.wait(max(0.0, last_render + self.min_interval - time.monotonic())):
+                return
+
+            self._requested.clear()
+            try:
+                self.render()
+            except Exception as error:
+                print(f"Plot refresh failed: {error!r}")
+            last_render = time.monotonic()
 
 class PlottingCallback(BaseCallback):
-    def __init__(self, save_path: str, verbose=0):
+    """
+    Training statistics over all envs in constant memory: action counts and running
+    episode totals per env.
+
+    Finished episodes go to an append-only metrics log, flushed every `flush_interval`
+    seconds; each run starts a new log unless `resume_log` is set. After each flush a
+    background thread reads the records added since its last refresh into binned series
+    and redraws the plots, at most every `plot_interval` seconds, so a running or killed
+    run has up-to-date plots and the learner never waits for matplotlib.
+    """
+
+    def __init__(self, save_path: str, verbose=0, log_path: Optional[str] = None, flush_interval: float = 30.0,
+                 plot_interval: float = 300.0, resume_log: bool = False):
         super().__init__(verbose)
         self.save_path = save_path
         os.makedirs(self.save_path, exist_ok=True)
 
-        self.episode_rewards = []
-        self.episode_lengths = []
-        self.actions = []
+        self.episode_count = 0
+
+        # Next to the plots directory by default: <model>/metrics/episodes.bin
+        self.log_path = log_path or os.path.join(os.path.dirname(os.path.abspath(save_path)), "metrics", "episodes.bin")
+        self.flush_interval = flush_interval
+        self.plot_interval = plot_interval
+        self.resume_log = resume_log
+
+        # Only the refresher thread touches these, and the final render after it stopped
+        self.rewards = BinnedSeries()
+        self.lengths = BinnedSeries()
+        self._rendered_episodes = 0
+
+        # Sized from the training env in _init_callback
+        self.action_counts = None
+        self.current_rewards = None
+        self.current_lengths = None
+        self._envs = None
 
-        self.current_rewards = 0.0
-        self.current_length = 0
+        self._log = None
+        self._refresher = None
+        self._last_flush = 0.0
+
+    def _init_callback(self) -> None:
+        n_envs = self.training_env.num_envs
+        self.action_counts = np.zeros((n_envs, self.training_env.action_space.n), dtype=np.int64)
+        self.current_rewards = np.zeros(n_envs, dtype=np.float64)
+        self.current_lengths = np.zeros(n_envs, dtype=np.int64)
+        self._envs = np.arange(n_envs)
+
+        self._log = MetricsLog(self.log_path, resume=self.resume_log)
+        self._last_flush = time.monotonic()
+        self._refresher = PlotRefresher(self._render, self.plot_interval)
+        self._refresher.start()
 
     def _on_step(self) -> bool:
-        reward = self.locals["rewards"]
-        done = self.locals["dones"]
-        action = self.locals["actions"]
+        rewards = np.asarray(self.locals["rewards"]).reshape(-1)
+        dones = np.asarray(self.locals["dones"]).reshape(-1)
+        actions = np.asarray(self.locals["actions"]).reshape(-1)
+
+        self.current_rewards += rewards
+        self.current_lengths += 1
+        self.action_counts[self._envs, actions] += 1
+
+        if dones.any():
+            finished = np.flatnonzero(dones)
+            self.episode_count += len(finished)
+            self._log.append(self.num_timesteps, finished, self.current_lengths[finished], self.current_rewards[finished])
 
-        self.current_rewards += reward[0]
-        self.current_length += 1
-        self.actions.append(action[0])
+            self.current_rewards[finished] = 0.0
+            self.current_lengths[finished] = 0
 
-        if done[0]:
-            self.episode_rewards.append(self.current_rewards)
-            self.episode_lengths.append(self.current_length)
-            self.current_rewards = 0.0
-            self.current_length = 0
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self._flush()
+            self._refresher.request()
 
         return True
 
+    def _flush(self):
+        self._log.flush()
+        # Action counts are small and cumulative, so a snapshot replaces the previous one
+        tmp_path = f"{self.log_path}.actions.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, self.action_counts)
+        os.replace(tmp_path, os.path.join(os.path.dirname(self.log_path), "action_counts.npy"))
+        self._last_flush = time.monotonic()
+
+    def _render(self):
+        while True:
+            records = read_episodes(self.log_path, self._rendered_episodes, READ_CHUNK_EPISODES)
+            if len(records) == 0:
+                break
+            self.rewards.extend(records['reward'])
+            self.lengths.extend(records['length'])
+            self._rendered_episodes += len(records)
+
+        render_plots(self.save_path, self.rewards, self.lengths, self.action_counts.sum(axis=0))
+
     def _on_training_end(self) -> None:
-        self._plot_rewards()
-        self._plot_lengths()
-        self._plot_action_distribution()
-
-    def _plot_rewards(self):
-        plt.figure(figsize=(10, 5))
-        plt.plot(range(1, len(self.episode_rewards) + 1), self.episode_rewards)
-        plt.title("Episode Rewards")
-        plt.xlabel("Episode")
-        plt.ylabel("Reward")
-        plt.grid(True)
-        plt.savefig(os.path.join(self.save_path, "rewards_plot.png"))
-        plt.close()
-
-    def _plot_lengths(self):
-        plt.figure(figsize=(10, 5))
-        plt.plot(range(1, len(self.episode_lengths) + 1), self.episode_lengths)
-        plt.title("Episode Lengths")
-        plt.xlabel("Episode")
-        plt.ylabel("Length")
-        plt.grid(True)
-        plt.savefig(os.path.join(self.save_path, "lengths_plot.png"))
-        plt.close()
-
-    def _plot_action_distribution(self):
-        plt.figure(figsize=(10, 5))
-        unique, counts = np.unique(self.actions, return_counts=True)
-        plt.bar(unique, counts, tick_label=[f"Action {a}" for a in unique])
-        plt.title("Action Distribution")
-        plt.xlabel("Action")
-        plt.ylabel("Frequency")
-        plt.grid(True)
-        plt.savefig(os.path.join(self.save_path, "action_distribution.png"))
-        plt.close()
-        
-    def _plot_action_distribution(self):
-        plt.figure(figsize=(10, 5))
-        unique, counts = np.unique(self.actions, return_counts=True)
-
-        full_actions = [0, 1, 2, 3]
-        full_labels = ["up", "down", "left", "right"]
-        full_counts = [counts[unique.tolist().index(i)] if i in unique else 0 for i in full_actions]
-
-        plt.bar(full_actions, full_counts, tick_label=full_labels)
-        plt.title("Action Distribution")
-        plt.xlabel("Action")
-        plt.ylabel("Frequency")
-        plt.grid(True)
-        plt.savefig(os.path.join(self.save_path, "action_distribution.png"))
-        plt.close()
+        self._refresher.stop()
+        self._flush()
+        self._render()
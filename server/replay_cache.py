@@ -0,0 +1,118 @@
+from pacman_constants import ENV_VERSION
+from typing import Dict, List, Optional, Tuple
+
+import threading
+import hashlib
+import os
+
+DEFAULT_MAX_BYTES = 256 * 2**20
+
+# Eviction frees down to this fraction of max_bytes, so it does not rescan on every put
+EVICT_TO = 0.9
+
+class ReplayCache:
+    """
+    Encoded episodes on disk, keyed by (checkpoint sha256, seed, ENV_VERSION). The policy
+    is deterministic and the seed fixes the ghosts, so a cached replay is exactly what a
+    new rollout would produce. Checkpoint digests are memoised by path, mtime and size.
+
+    The cache holds at most `max_bytes` of replays. Reads touch a replay's mtime, and the
+    least recently used replays are removed first.
+    """
+
+    def __init__(self, root: str = "replay_cache", max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+        self._digests: Dict[str, Tuple[tuple, str]] = {}
+        self._lock = threading.Lock()
+
+        self._size: Optional[int] = None  # bytes of replays on disk, counted on the first put
+        self._size_lock = threading.Lock()
+
+    def checkpoint_digest(self, model_path: str) -> str:
+        stat = os.stat(model_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._digests.get(model_path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        sha = hashlib.sha256()
+        with open(model_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+
+        digest = sha.hexdigest()
+        with self._lock:
+            self._digests[model_path] = (version, digest)
+
+        return digest
+
+    def path(self, model_path: str, seed: int) -> str:
+        digest = self.checkpoint_digest(model_path)
+        return os.path.join(self.root, digest[:2], f"{digest}-seed{seed}-env{ENV_VERSION}.bin")
+
+    def get(self, model_path: str, seed: int) -> Optional[bytes]:
+        path = self.path(model_path, seed)
+        try:
+            with open(path, 'rb') as f:
+                replay = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return replay
+
+    def put(self, model_path: str, seed: int, replay: bytes):
+        path = self.path(model_path, seed)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write then rename, so concurrent readers never see a partial replay
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(replay)
+
+        with self._size_lock:
+            try:
+                replaced = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(tmp_path, path)
+
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += len(replay) - replaced
+
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[Tuple[int, int, str]]:
+        """(mtime_ns, size, path) of every cached replay."""
+        entries = []
+        for directory in os.scandir(self.root):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if not entry.name.endswith(".bin"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return entries
+
+    def _evict(self):
+        entries = sorted(self._entries())
+        self._size = sum(size for _, size, _ in entries)
+
+        for _, size, path in entries:
+            if self._size <= self.max_bytes * EVICT_TO:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
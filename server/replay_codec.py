@@ -0,0 +1,134 @@
+from typing import List
+
+import numpy as np
+import struct
+import json
+
+REPLAY_MEDIA_TYPE = "application/x-pacman-replay"
+REPLAY_MAGIC = b"PMRP"
+REPLAY_VERSION = 2
+
+# magic, version, ghost count, position width, time delta width, score delta width, frame count,
+# first timestamp, first score
+HEADER = struct.Struct("<4sBBBBBIii")
+# Version 1 had no position width; its positions are always int8
+HEADER_V1 = struct.Struct("<4sBBBBIii")
+
+POSITION_TYPES = {1: "<i1", 2: "<i2", 4: "<i4"}
+DELTA_TYPES = {2: "<i2", 4: "<i4"}
+
+# Columnar little-endian replay of one episode, as produced by PacmanPlayer.play():
+#
+#   header                  see HEADER
+#   ghost types             uint8[ghosts]        constant for the whole episode
+#   pacman x, pacman y      int8, int16 or int32[frames] each
+#   ghost x, ghost y        same width[frames * ghosts] each, frame-major
+#   ghost states            uint8[frames]        2 bits per ghost, ghost i in bits 2i..2i+1
+#   game over               uint8[ceil(frames / 8)], one bit per frame, LSB first
+#   timestamp deltas        int16 or int32[frames - 1]
+#   score deltas            int16 or int32[frames - 1]
+
+def encode_ndjson_frame(info: dict) -> str:
+    # GhostState enums go out as their values, like in the JSON episodes
+    return json.dumps(info, default=lambda value: value.value) + "\n"
+
+def _state_value(state) -> int:
+    return getattr(state, "value", state)
+
+def _deltas(values: np.ndarray):
+    deltas = np.diff(values)
+    if len(deltas) == 0 or (deltas.min() >= -2**15 and deltas.max() < 2**15):
+        return 2, deltas.astype("<i2")
+    return 4, deltas.astype("<i4")
+
+def _position_width(positions: np.ndarray) -> int:
+    # Off-grid cells are walkable, so coordinates are not bounded by the map size
+    for width, dtype in POSITION_TYPES.items():
+        info = np.iinfo(dtype)
+        if len(positions) == 0 or (positions.min() >= info.min and positions.max() <= info.max):
+            return width
+    raise ValueError("Positions do not fit in 32 bits")
+
+def encode_episode(frames: List[dict]) -> bytes:
+    n = len(frames)
+    g = len(frames[0]["ghosts"]) if n else 0
+    if g > 4:
+        raise ValueError("Replay format supports at most 4 ghosts")
+
+    pacman = np.array([(f["pacman"]["x"], f["pacman"]["y"]) for f in frames], dtype=np.int64).reshape(n, 2)
+    ghosts = np.array(
+        [[(ghost["x"], ghost["y"], ghost["type"], _state_value(ghost["state"])) for ghost in f["ghosts"]] for f in frames],
+        dtype=np.int64
+    ).reshape(n, g, 4)
+
+    types = ghosts[0, :, 2] if n else np.zeros(0, dtype=np.int64)
+    if np.any(ghosts[:, :, 2] != types):
+        raise ValueError("Ghost types must not change during an episode")
+
+    states = (ghosts[:, :, 3] << (2 * np.arange(g))).sum(axis=1)
+    game_over = np.packbits(np.array([f["game_over"] for f in frames], dtype=bool), bitorder="little")
+
+    position_width = _position_width(np.concatenate([pacman.ravel(), ghosts[:, :, :2].ravel()]))
+    position_type = POSITION_TYPES[position_width]
+
+    timestamps = np.array([f["timestamp"] for f in frames], dtype=np.int64)
+    scores = np.array([f["score"] for f in frames], dtype=np.int64)
+    time_width, time_deltas = _deltas(timestamps)
+    score_width, score_deltas = _deltas(scores)
+
+    header = HEADER.pack(
+        REPLAY_MAGIC, REPLAY_VERSION, g, position_width, time_width, score_width, n,
+        int(timestamps[0]) if n else 0, int(scores[0]) if n else 0
+    )
+
+    return b"".join([
+        header,
+        types.astype(np.uint8).tobytes(),
+        pacman[:, 0].astype(position_type).tobytes(), pacman[:, 1].astype(position_type).tobytes(),
+        ghosts[:, :, 0].astype(position_type).tobytes(), ghosts[:, :, 1].astype(position_type).tobytes(),
+        states.astype(np.uint8).tobytes(),
+        game_over.tobytes(),
+        time_deltas.tobytes(), score_deltas.tobytes(),
+    ])
+
+def decode_episode(data: bytes) -> List[dict]:
+    magic, version = struct.unpack_from("<4sB", data)
+    if magic != REPLAY_MAGIC or version not in (1, REPLAY_VERSION):
+        raise ValueError(f"Not a version 1 or {REPLAY_VERSION} replay")
+
+    if version == 1:
+        _, _, g, time_width, score_width, n, timestamp, score = HEADER_V1.unpack_from(data)
+        position_width, offset = 1, HEADER_V1.size
+    else:
+        _, _, g, position_width, time_width, score_width, n, timestamp, score = HEADER.unpack_from(data)
+        offset = HEADER.size
+    position_type = POSITION_TYPES[position_width]
+
+    def column(dtype, count):
+        nonlocal offset
+        values = np.frombuffer(data, dtype=dtype, count=count, offset=offset)
+        offset += values.nbytes
+        return values
+
+    types = column(np.uint8, g)
+    pacman_x, pacman_y = column(position_type, n), column(position_type, n)
+    ghost_x, ghost_y = column(position_type, n * g).reshape(n, g), column(position_type, n * g).reshape(n, g)
+    states = (column(np.uint8, n)[:, None] >> (2 * np.arange(g))) & 3
+    game_over = np.unpackbits(column(np.uint8, (n + 7) // 8), count=n, bitorder="little")
+
+    timestamps = timestamp + np.concatenate([[0], np.cumsum(column(DELTA_TYPES[time_width], max(n - 1, 0)))])
+    scores = score + np.concatenate([[0], np.cumsum(column(DELTA_TYPES[score_width], max(n - 1, 0)))])
+
+    return [
+        {
+            "pacman": {"x": int(pacman_x[i]), "y": int(pacman_y[i])},
+            "ghosts": [
+                {"x": int(ghost_x[i, j]), "y": int(ghost_y[i, j]), "type": int(types[j]), "state": int(states[i, j])}
+                for j in range(g)
+            ],
+            "timestamp": int(timestamps[i]),
+            "game_over": bool(game_over[i]),
+            "score": int(scores[i]),
+        }
+        for i in range(n)
+    ]
@@ -0,0 +1,278 @@
+from typing import AsyncIterator, Callable, List, Optional, Sequence, Tuple, Union
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from queue import Empty, Full
+
+import multiprocessing
+import threading
+import asyncio
+import weakref
+import os
+
+STREAM_CHUNK_FRAMES = 32
+STREAM_QUEUE_CHUNKS = 8
+STREAM_POLL_SECONDS = 0.5
+
+# Each worker may hold a full torch/SB3 stack and its own model cache, so the default stays
+# small however many cores there are
+DEFAULT_MAX_WORKERS = 2
+
+# Per-process state of a rollout worker
+_worker_cache: Optional['ModelCache'] = None
+
+def _init_worker(max_models: int):
+    global _worker_cache
+
+    # Only workers load policies, so numpy, and torch for checkpoints without a NumPy
+    # export, are imported here rather than in the server process
+    from model_cache import ModelCache
+
+    # Several workers share the machine, so each runs torch inference on a single thread
+    _worker_cache = ModelCache(max_entries=max_models, torch_threads=1)
+
+def _preload(preload_paths: Sequence[str]):
+    for model_path in preload_paths:
+        try:
+            _worker_cache.get(model_path)
+        except Exception as e:
+            print(f"Could not preload {model_path}: {e}")
+
+def _run_rollout(model_path: str, num_episodes: int, seed: Optional[int], compact: bool) -> Union[List[dict], bytes]:
+    from replay_codec import encode_episode
+    from pacman_player import PacmanPlayer
+
+    player = PacmanPlayer(model_path, _worker_cache.get(model_path))
+    episode = player.play(num_episodes, seed)
+
+    if not compact:
+        return episode
+
+    # Encoding in the worker also keeps the result that crosses the process boundary small;
+    # an episode the replay format cannot hold goes back as info dicts
+    try:
+        return encode_episode(episode)
+    except ValueError:
+        return episode
+
+def _stream_rollout(model_path: str, seed: Optional[int], queue, stop) -> Optional[bytes]:
+    from replay_codec import encode_episode, encode_ndjson_frame
+    from pacman_player import PacmanPlayer
+
+    def put(item) -> bool:
+        # The queue is bounded; give up once the reader has gone away
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=STREAM_POLL_SECONDS)
+                return True
+            except Full:
+                pass
+        return False
+
+    try:
+        player = PacmanPlayer(model_path, _worker_cache.get(model_path))
+
+        episode, chunk = [], []
+        for i, info in enumerate(player.frames(seed)):
+            episode.append(info)
+            chunk.append(encode_ndjson_frame(info))
+
+            # The first frame goes out on its own to keep time-to-first-frame low
+            if i == 0 or len(chunk) >= STREAM_CHUNK_FRAMES:
+                if not put("".join(chunk)):
+                    return
+                chunk = []
+
+        if chunk and not put("".join(chunk)):
+            return
+        put(None)
+    except Exception as e:
+        put(e)
+        return
+
+    # The whole episode goes back as the task result, for the server to cache
+    try:
+        return encode_episode(episode)
+    except ValueError:
+        return None
+
+def _next_chunk(queue, stop, future: Future):
+    # Polls, so the reading thread is freed once the stream is abandoned or its worker is gone;
+    # None ends the stream either way and the future carries any worker error
+    while not stop.is_set():
+        try:
+            return queue.get(timeout=STREAM_POLL_SECONDS)
+        except Empty:
+            if future.done():
+                return None
+    return None
+
+def _warm_up():
+    # A no-op task: submitting one makes the executor spawn (and initialise) another worker now
+    pass
+
+class PoolBusyError(Exception):
+    pass
+
+class WorkerCrashedError(Exception):
+    pass
+
+class _Admission:
+    def __init__(self, pool: 'RolloutPool'):
+        self.pool = pool
+        self.active = True
+        pool._pending += 1
+
+    def release(self):
+        if self.active:
+            self.active = False
+            self.pool._pending -= 1
+
+class RolloutPool:
+    """
+    Runs episode rollouts in worker processes so inference never blocks the event loop.
+
+    At most `max_workers` rollouts run at once; further requests wait for a slot, and
+    once `max_pending` requests are running or waiting new ones are rejected. The
+    `preload_paths` are loaded by one worker only; the others load models on demand.
+    A worker that dies takes the executor with it, so a new one replaces it.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 preload_paths: Sequence[str] = (), max_models: int = 4):
+        self.max_workers = max_workers or min(os.cpu_count() or 1, DEFAULT_MAX_WORKERS)
+        self.max_pending = max_pending if max_pending is not None else 4 * self.max_workers
+        self.preload_paths = list(preload_paths)
+        self.max_models = max_models
+
+        self._executor = self._new_executor()
+        self._executor_lock = threading.Lock()
+
+        # Streamed frames travel through manager queues, which work across spawned processes;
+        # the manager is its own process, started on the first stream
+        self._manager = None
+        self._manager_lock = threading.Lock()
+
+        # Stream readers block on their queue; they get their own threads, one per rollout slot,
+        # so they never hold up the default executor that serves the replay cache
+        self._readers = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stream-reader")
+
+        self._slots = asyncio.Semaphore(self.max_workers)
+        self._pending = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Workers are spawned rather than forked: the server process may already run threads
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.max_models,)
+        )
+
+    def start_workers(self):
+        """Starts the workers, and the preloading in one of them, ahead of the first request."""
+        executor = self._executor
+        executor.submit(_preload, self.preload_paths)
+        for _ in range(self.max_workers - 1):
+            executor.submit(_warm_up)
+
+    def _submit(self, fn, *args) -> Tuple[ProcessPoolExecutor, Future]:
+        executor = self._executor
+        try:
+            return executor, executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._replace_executor(executor)
+            executor = self._executor
+            return executor, executor.submit(fn, *args)
+
+    def _replace_executor(self, broken: ProcessPoolExecutor):
+        with self._executor_lock:
+            # Several requests may see the same crash; only the first replaces the executor
+            if self._executor is broken:
+                self._executor = self._new_executor()
+                broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _result(self, executor: ProcessPoolExecutor, future: Future):
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool as e:
+            self._replace_executor(executor)
+            raise WorkerCrashedError("A rollout worker exited unexpectedly") from e
+
+    def _queue_manager(self):
+        with self._manager_lock:
+            if self._manager is None:
+                self._manager = multiprocessing.get_context("spawn").Manager()
+            return self._manager
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _admit(self):
+        if self._pending >= self.max_pending:
+            raise PoolBusyError(f"{self._pending} rollouts already pending")
+
+    async def play(self, model_path: str, num_episodes: int = 1, seed: Optional[int] = None,
+                   compact: bool = False) -> Union[List[dict], bytes]:
+        """
+        The best of `num_episodes` episodes, as info dicts or, if `compact`, as an encoded replay
+        when the episode fits the replay format (else as info dicts too).
+        """
+        self._admit()
+
+        self._pending += 1
+        try:
+            async with self._slots:
+                executor, future = self._submit(_run_rollout, model_path, num_episodes, seed, compact)
+                return await self._result(executor, future)
+        finally:
+            self._pending -= 1
+
+    def stream(self, model_path: str, seed: Optional[int] = None,
+               on_replay: Optional[Callable[[bytes], None]] = None) -> AsyncIterator[str]:
+        """
+        Plays one episode and yields its frames as NDJSON chunks while the worker runs.
+        Admission is checked immediately, so PoolBusyError is raised before streaming starts.
+        Once every frame has been sent, `on_replay` gets the encoded episode, in a thread.
+        """
+        self._admit()
+        admission = _Admission(self)
+
+        frames = self._stream(model_path, seed, admission, on_replay)
+        # A response that is dropped before it starts iterating must still free its admission
+        weakref.finalize(frames, admission.release)
+        return frames
+
+    async def _stream(self, model_path: str, seed: Optional[int], admission: _Admission,
+                      on_replay: Optional[Callable[[bytes], None]]) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        manager = await asyncio.to_thread(self._queue_manager)
+        queue = manager.Queue(STREAM_QUEUE_CHUNKS)
+        stop = manager.Event()
+
+        try:
+            async with self._slots:
+                executor, future = self._submit(_stream_rollout, model_path, seed, queue, stop)
+
+                while True:
+                    chunk = await loop.run_in_executor(self._readers, _next_chunk, queue, stop, future)
+                    if chunk is None:
+                        break
+                    if isinstance(chunk, Exception):
+                        raise chunk
+                    yield chunk
+
+                replay = await self._result(executor, future)
+
+            if replay is not None and on_replay is not None:
+                await asyncio.to_thread(on_replay, replay)
+        finally:
+            # Also reached when the client disconnects: tell the worker to stop producing
+            stop.set()
+            admission.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._readers.shutdown(wait=False, cancel_futures=True)
+        if self._manager is not None:
+            self._manager.shutdown()
@@ -1,16 +1,52 @@
+from rollout_pool import RolloutPool, PoolBusyError, WorkerCrashedError, STREAM_CHUNK_FRAMES
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
-from fastapi import FastAPI, HTTPException
-from pacman_player import PacmanPlayer
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from fastapi import FastAPI, Header, HTTPException, Query
+from contextlib import asynccontextmanager
+from agent_catalog import AgentCatalog
+from replay_cache import ReplayCache
+from typing import Optional
 
 import uvicorn
-import json
+import asyncio
+import random
 import os
-import re
 
-app = FastAPI()
+catalog = AgentCatalog("agents")
 
-CHECKPOINT_STEP = 20
+# Seeded episodes are deterministic, so each one is simulated once and then served from disk;
+# past this size the least recently served replays are dropped
+REPLAY_CACHE_BYTES = 256 * 2**20
+replay_cache = ReplayCache("replay_cache", REPLAY_CACHE_BYTES)
+
+# Rollouts run in worker processes, each keeping its own cache of loaded policies;
+# one worker loads the agents' best models when it starts
+ROLLOUT_WORKERS = None  # defaults to the CPU count, at most 2
+MAX_PENDING_ROLLOUTS = None  # defaults to 4 per worker
+PRELOAD_BEST_MODELS = True
+
+# Requests without a seed play a random episode; the seed used is sent back in this header
+# so the episode can be requested again, and served from the replay cache
+SEED_HEADER = "X-Episode-Seed"
+
+rollout_pool: RolloutPool = None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global rollout_pool
+
+    preload_paths = []
+    if PRELOAD_BEST_MODELS:
+        preload_paths = [entry.best_model_path for entry in catalog.models() if entry.best_model_path]
+
+    rollout_pool = RolloutPool(ROLLOUT_WORKERS, MAX_PENDING_ROLLOUTS, preload_paths)
+    # Workers import the ML stack and load their models; they start once the server is up,
+    # so the catalog and plot endpoints answer without waiting for them
+    asyncio.get_running_loop().call_soon(rollout_pool.start_workers)
+    yield
+    rollout_pool.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,125 +54,113 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[SEED_HEADER],
 )
 
 @app.get("/agents")
 def list_trained_agents():
-    root = "agents"
-    agents = []
-
-    for algo in os.listdir(root):
-        algo_path = os.path.join(root, algo)
-        if not os.path.isdir(algo_path):
-            continue
-
-        for model in os.listdir(algo_path):
-            model_path = os.path.join(algo_path, model)
-            ckpt_path = os.path.join(model_path, "checkpoints")
-            plots_path = os.path.join(model_path, "plots")
-
-            if not os.path.isdir(ckpt_path):
-                continue
-
-            checkpoint_files = [
-                f for f in os.listdir(ckpt_path)
-                if re.match(r"model_(\d+)_steps\.zip", f)
-            ]
-            
-            if not checkpoint_files:
-                continue
-
-            special_files_count = 0
-            if os.path.exists(os.path.join(model_path, "best_model.zip")):
-                special_files_count += 1
-                
-            if os.path.exists(os.path.join(model_path, f"{model}.zip")):
-                special_files_count += 1
-            
-            checkpoint_count = (len(checkpoint_files) + CHECKPOINT_STEP - 1) // CHECKPOINT_STEP
-            total_files = special_files_count + checkpoint_count
-
-            description_path = os.path.join(model_path, "description.json")
-            description = ""
-            if os.path.exists(description_path):
-                with open(description_path, 'r') as f:
-                    try:
-                        description = json.load(f)
-                    except json.JSONDecodeError:
-                        description = ""
-                        
-            num_plots = 0
-            if os.path.isdir(plots_path):
-                num_plots = len([f for f in os.listdir(plots_path) if f.endswith(".png")])
-
-            agents.append({
-                "model_name": f"{algo}/{model}",
-                "checkpoints": total_files,
-                "description": description,
-                "plots": num_plots,
-            })
-
-    return agents
+    return [
+        {
+            "model_name": f"{entry.algo}/{entry.model}",
+            "checkpoints": entry.total_files,
+            "description": entry.description,
+            "plots": len(entry.plot_files or []),
+        }
+        for entry in catalog.models()
+        if entry.checkpoint_files
+    ]
 
 @app.get("/plots/{agent}/{model_name}/{plot_index}")
 def get_plot(agent: str, model_name: str, plot_index: int):
-    plots_dir = os.path.join("agents", agent, model_name, "plots")
+    entry = catalog.get(agent, model_name)
 
-    if not os.path.exists(plots_dir):
+    if entry is None or entry.plot_files is None:
         raise HTTPException(status_code=404, detail=f"Plots directory not found for model {model_name}")
 
-    plot_files = sorted([f for f in os.listdir(plots_dir) if f.endswith(".png")])
-    if not plot_files or plot_index >= len(plot_files):
+    if not entry.plot_files or not 0 <= plot_index < len(entry.plot_files):
         raise HTTPException(status_code=404, detail=f"Plot index {plot_index} out of range")
 
-    plot_path = os.path.join(plots_dir, plot_files[plot_index])
+    plot_path = os.path.join(entry.path, "plots", entry.plot_files[plot_index])
     return FileResponse(plot_path, media_type="image/png")
 
-@app.get("/{agent}/{model_name}/{checkpoint}")
-def get_agent_results(agent: str, model_name: str, checkpoint: int):
-    model_base_path = f"agents/{agent}/{model_name}"
+def resolve_model_file(agent: str, model_name: str, checkpoint: int) -> str:
+    entry = catalog.get(agent, model_name)
 
-    if not os.path.exists(model_base_path):
+    if entry is None:
         raise HTTPException(status_code=404, detail=f"Model {model_name} not found")
 
-    special_files = []
-    checkpoint_files = []
-
-    checkpoints_dir = os.path.join(model_base_path, "checkpoints")
-    if os.path.exists(checkpoints_dir):
-        pattern = re.compile(r"model_(\d+)_steps\.zip")
-        checkpoints = []
-
-        for filename in os.listdir(checkpoints_dir):
-            match = pattern.match(filename)
-            if match:
-                steps = int(match.group(1))
-                checkpoints.append((steps, os.path.join(checkpoints_dir, filename)))
-
-        checkpoints.sort(key=lambda x: x[0])
-        checkpoint_files = [path for _, path in checkpoints]
-
-    model_zip_path = os.path.join(model_base_path, f"{model_name}.zip")
-    if os.path.exists(model_zip_path):
-        special_files.append(model_zip_path)
-
-    best_model_path = os.path.join(model_base_path, "best_model.zip")
-    if os.path.exists(best_model_path):
-        special_files.append(best_model_path)
-
-    checkpoint_count = (len(checkpoint_files) + CHECKPOINT_STEP - 1) // CHECKPOINT_STEP
-    if checkpoint < checkpoint_count:
-        checkpoint_index = checkpoint * CHECKPOINT_STEP
-        if checkpoint_index >= len(checkpoint_files):
-            checkpoint_index = len(checkpoint_files) - 1
-
-        model_file_path = checkpoint_files[checkpoint_index]
-    else:
-        special_index = checkpoint - checkpoint_count
-        model_file_path = special_files[special_index]
+    model_file_path = entry.resolve_checkpoint(checkpoint)
+    if model_file_path is None:
+        raise HTTPException(status_code=404, detail=f"Checkpoint {checkpoint} not found for model {model_name}")
+
+    return model_file_path
+
+def episode_seed(seed: Optional[int]) -> int:
+    return random.randrange(2**31) if seed is None else seed
+
+def pool_busy() -> HTTPException:
+    return HTTPException(status_code=503, detail="Too many episodes in progress", headers={"Retry-After": "1"})
+
+@app.get("/{agent}/{model_name}/{checkpoint}")
+async def get_agent_results(
+    agent: str, model_name: str, checkpoint: int, response: Response,
+    seed: Optional[int] = Query(None, ge=0),
+    encoding: Optional[str] = Query(None, alias="format"),
+    accept: Optional[str] = Header(None)
+):
+    # The codec needs numpy, which the catalog and plot endpoints never load
+    from replay_codec import REPLAY_MEDIA_TYPE, decode_episode
+
+    model_file_path = resolve_model_file(agent, model_name, checkpoint)
+    seed = episode_seed(seed)
+    
+    replay = await asyncio.to_thread(replay_cache.get, model_file_path, seed)
+    if replay is None:
+        try:
+            replay = await rollout_pool.play(model_file_path, seed=seed, compact=True)
+        except PoolBusyError:
+            raise pool_busy()
+        except WorkerCrashedError:
+            # The pool has already replaced the dead worker, so a retry can succeed
+            raise HTTPException(status_code=503, detail="Rollout worker crashed", headers={"Retry-After": "1"})
+        
+        # Episodes the replay format cannot hold come back as info dicts and are not cached
+        if isinstance(replay, bytes):
+            await asyncio.to_thread(replay_cache.put, model_file_path, seed, replay)
+    
+    # The compact columnar replay is opt-in, through ?format=compact or the Accept header
+    if encoding == "compact" or REPLAY_MEDIA_TYPE in (accept or ""):
+        if not isinstance(replay, bytes):
+            raise HTTPException(status_code=406, detail="This episode has no compact replay; request JSON instead")
+        return Response(replay, media_type=REPLAY_MEDIA_TYPE, headers={SEED_HEADER: str(seed)})
+    
+    response.headers[SEED_HEADER] = str(seed)
+    return decode_episode(replay) if isinstance(replay, bytes) else replay
+
+async def stream_cached(replay: bytes):
+    from replay_codec import decode_episode, encode_ndjson_frame
+
+    frames = decode_episode(replay)
+    for start in range(0, len(frames), STREAM_CHUNK_FRAMES):
+        yield "".join(encode_ndjson_frame(info) for info in frames[start:start + STREAM_CHUNK_FRAMES])
+
+@app.get("/{agent}/{model_name}/{checkpoint}/stream")
+async def stream_agent_results(agent: str, model_name: str, checkpoint: int, seed: Optional[int] = Query(None, ge=0)):
+    model_file_path = resolve_model_file(agent, model_name, checkpoint)
+    seed = episode_seed(seed)
+    headers = {SEED_HEADER: str(seed)}
+    
+    replay = await asyncio.to_thread(replay_cache.get, model_file_path, seed)
+    if replay is not None:
+        return StreamingResponse(stream_cached(replay), media_type="application/x-ndjson", headers=headers)
+    
+    try:
+        # A stream that runs to the end caches its episode, like the episode endpoint
+        frames = rollout_pool.stream(model_file_path, seed, lambda replay: replay_cache.put(model_file_path, seed, replay))
+    except PoolBusyError:
+        raise pool_busy()
     
-    player = PacmanPlayer(model_file_path)
-    return player.play()
+    return StreamingResponse(frames, media_type="application/x-ndjson", headers=headers)
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
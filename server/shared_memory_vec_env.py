@@ -0,0 +1,228 @@
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper, VecEnv, VecEnvIndices, VecEnvStepReturn
+from stable_baselines3.common.vec_env.patch_gym import _patch_env
+from typing import Any, Callable, List, Optional, Tuple
+
+import multiprocessing
+import gymnasium as gym
+import numpy as np
+import os
+
+def available_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def worker_layout(n_envs: Optional[int] = None, envs_per_worker: int = 4) -> Tuple[int, int]:
+    """(workers, n_envs): one worker per core left after the learner's, `envs_per_worker` envs each by default."""
+    workers = max(1, available_cores() - 1)
+    if n_envs is None:
+        n_envs = workers * envs_per_worker
+    return min(workers, n_envs), n_envs
+
+class _SharedBuffers:
+    def __init__(self, context, n_envs: int, obs_shape: Tuple[int, ...], obs_dtype: np.dtype):
+        obs_size = n_envs * int(np.prod(obs_shape)) * np.dtype(obs_dtype).itemsize
+
+        self.raw = {
+            'obs': context.RawArray('b', obs_size),
+            'terminal_obs': context.RawArray('b', obs_size),
+            'actions': context.RawArray('b', n_envs * 8),
+            'rewards': context.RawArray('b', n_envs * 4),
+            'flags': context.RawArray('b', n_envs * 2),
+        }
+        self.shape = (n_envs, *obs_shape)
+        self.dtype = np.dtype(obs_dtype)
+
+    def arrays(self):
+        # Views over the same memory in the learner and in every worker
+        obs = np.frombuffer(self.raw['obs'], dtype=self.dtype).reshape(self.shape)
+        terminal_obs = np.frombuffer(self.raw['terminal_obs'], dtype=self.dtype).reshape(self.shape)
+        actions = np.frombuffer(self.raw['actions'], dtype=np.int64)
+        rewards = np.frombuffer(self.raw['rewards'], dtype=np.float32)
+        flags = np.frombuffer(self.raw['flags'], dtype=bool).reshape(-1, 2)  # done, truncated
+        return obs, terminal_obs, actions, rewards, flags
+
+def _worker(remote, parent_remote, env_fns: CloudpickleWrapper, indices: List[int], buffers: _SharedBuffers):
+    from stable_baselines3.common.env_util import is_wrapped
+
+    parent_remote.close()
+    envs = [_patch_env(env_fn()) for env_fn in env_fns.var]
+    obs, terminal_obs, actions, rewards, flags = buffers.arrays()
+
+    # Envs that can render straight into a caller's buffer (PacmanEnv) write their observations in place
+    views = {i: obs[i] for i in indices}
+    for env, i in zip(envs, indices):
+        set_buffer = getattr(env.unwrapped, 'set_observation_buffer', None)
+        if set_buffer is not None:
+            set_buffer(views[i])
+
+    def store(i: int, observation):
+        if observation is not views[i]:
+            views[i][...] = observation
+
+    while True:
+        try:
+            cmd, data = remote.recv()
+        except (EOFError, KeyboardInterrupt):
+            break
+
+        if cmd == "step":
+            # Only the infos of finished episodes go back through the pipe
+            finished = []
+            for env, i in zip(envs, indices):
+                observation, reward, terminated, truncated, info = env.step(actions[i])
+                store(i, observation)
+                rewards[i] = reward
+                flags[i] = (terminated or truncated, truncated and not terminated)
+
+                if terminated or truncated:
+                    terminal_obs[i] = obs[i]
+                    store(i, env.reset()[0])
+                    finished.append((i, info))
+            remote.send(finished)
+        elif cmd == "reset":
+            reset_infos = []
+            for env, i, (seed, options) in zip(envs, indices, data):
+                observation, reset_info = env.reset(seed=seed, **({"options": options} if options else {}))
+                store(i, observation)
+                reset_infos.append(reset_info)
+            remote.send(reset_infos)
+        elif cmd == "close":
+            for env in envs:
+                env.close()
+            remote.close()
+            break
+        elif cmd == "env_method":
+            name, args, kwargs, local = data
+            remote.send([envs[j].get_wrapper_attr(name)(*args, **kwargs) for j in local])
+        elif cmd == "get_attr":
+            name, local = data
+            remote.send([envs[j].get_wrapper_attr(name) for j in local])
+        elif cmd == "set_attr":
+            name, value, local = data
+            remote.send([setattr(envs[j], name, value) for j in local])
+        elif cmd == "is_wrapped":
+            wrapper_class, local = data
+            remote.send([is_wrapped(envs[j], wrapper_class) for j in local])
+        else:
+            raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+
+class SharedMemoryVecEnv(VecEnv):
+    """
+    Subprocess vec env in which each worker steps a slice of the envs and exchanges
+    observations, actions, rewards and done flags with the learner through shared NumPy
+    buffers. Per step, a worker's pipe only carries the step command and the infos of
+    episodes that just ended. Finished envs are reset in the worker and report their
+    'terminal_observation'; infos of unfinished episodes are empty.
+    """
+
+    def __init__(self, env_fns: List[Callable[[], gym.Env]], n_workers: Optional[int] = None,
+                 start_method: Optional[str] = None):
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+        n_workers = min(n_workers or worker_layout(n_envs)[0], n_envs)
+
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        context = multiprocessing.get_context(start_method)
+
+        # A throwaway env gives the spaces, so the buffers exist before the workers start
+        probe = env_fns[0]()
+        observation_space, action_space = probe.observation_space, probe.action_space
+        probe.close()
+
+        self._buffers = _SharedBuffers(context, n_envs, observation_space.shape, observation_space.dtype)
+        self._obs, self._terminal_obs, self._actions, self._rewards, self._flags = self._buffers.arrays()
+
+        self._slices = [indices.tolist() for indices in np.array_split(np.arange(n_envs), n_workers)]
+        self._worker_of = np.zeros(n_envs, dtype=np.int64)
+        self._local_index = np.zeros(n_envs, dtype=np.int64)
+        for worker, indices in enumerate(self._slices):
+            self._worker_of[indices] = worker
+            self._local_index[indices] = np.arange(len(indices))
+
+        self.remotes, self.work_remotes = zip(*[context.Pipe() for _ in range(n_workers)])
+        self.processes = []
+        for work_remote, remote, indices in zip(self.work_remotes, self.remotes, self._slices):
+            args = (work_remote, remote, CloudpickleWrapper([env_fns[i] for i in indices]), indices, self._buffers)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = context.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        super().__init__(n_envs, observation_space, action_space)
+
+    @classmethod
+    def for_cores(cls, env_fn: Callable[[], gym.Env], n_envs: Optional[int] = None, envs_per_worker: int = 4,
+                  start_method: Optional[str] = None) -> 'SharedMemoryVecEnv':
+        """One worker per core not used by the learner; `n_envs` defaults to `envs_per_worker` per worker."""
+        n_workers, n_envs = worker_layout(n_envs, envs_per_worker)
+        return cls([env_fn] * n_envs, n_workers, start_method)
+
+    def step_async(self, actions: np.ndarray) -> None:
+        self._actions[:] = np.asarray(actions).reshape(self.num_envs)
+        for remote in self.remotes:
+            remote.send(("step", None))
+        self.waiting = True
+
+    def step_wait(self) -> VecEnvStepReturn:
+        finished = [item for remote in self.remotes for item in remote.recv()]
+        self.waiting = False
+
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+        for i, info in finished:
+            info["TimeLimit.truncated"] = bool(self._flags[i, 1])
+            info["terminal_observation"] = self._terminal_obs[i].copy()
+            infos[i] = info
+
+        return self._obs.copy(), self._rewards.copy(), self._flags[:, 0].copy(), infos
+
+    def reset(self) -> np.ndarray:
+        for remote, indices in zip(self.remotes, self._slices):
+            remote.send(("reset", [(self._seeds[i], self._options[i]) for i in indices]))
+        self.reset_infos = [info for remote in self.remotes for info in remote.recv()]
+
+        # Seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        return self._obs.copy()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        if self.waiting:
+            for remote in self.remotes:
+                remote.recv()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        self.closed = True
+
+    def _call(self, cmd: str, indices: VecEnvIndices, *data) -> List[Any]:
+        # Sends the command to every worker owning one of the envs, with their local indices
+        indices = self._get_indices(indices)
+        by_worker = {}
+        for i in indices:
+            by_worker.setdefault(int(self._worker_of[i]), []).append(int(self._local_index[i]))
+
+        for worker, local in by_worker.items():
+            self.remotes[worker].send((cmd, (*data, local)))
+        results = {worker: iter(self.remotes[worker].recv()) for worker in by_worker}
+
+        return [next(results[int(self._worker_of[i])]) for i in indices]
+
+    def get_attr(self, attr_name: str, indices: VecEnvIndices = None) -> List[Any]:
+        return self._call("get_attr", indices, attr_name)
+
+    def set_attr(self, attr_name: str, value: Any, indices: VecEnvIndices = None) -> None:
+        self._call("set_attr", indices, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices: VecEnvIndices = None, **method_kwargs) -> List[Any]:
+        return self._call("env_method", indices, method_name, method_args, method_kwargs)
+
+    def env_is_wrapped(self, wrapper_class: type, indices: VecEnvIndices = None) -> List[bool]:
+        return self._call("is_wrapped", indices, wrapper_class)
@@ -0,0 +1,112 @@
+from collections import defaultdict
+from typing import Callable, Dict, List, Tuple
+
+import time
+
+class StepProfiler:
+    """
+    Wall time per phase of PacmanEnv.step, and per ghost type for the ghost updates, kept
+    in perf_counter_ns accumulators. It works by wrapping the phase methods on the env's
+    own objects and removes the wrappers when uninstalled, so an env that is not being
+    profiled runs exactly the code it always does.
+    """
+
+    def __init__(self, env):
+        self.env = env
+
+        self.totals: Dict[str, int] = defaultdict(int)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self._installed: List[Tuple[object, str]] = []
+
+    def install(self):
+        env = self.env
+
+        for ghost in env.ghosts:
+            self._wrap(ghost, 'update', f"ghosts.{ghost.type.name.lower()}")
+        self._wrap(env.pacman, 'update', "pacman")
+        self._wrap(env, '_check_dot_collision', "dot_collision")
+        self._wrap(env, '_check_ghost_collision', "ghost_collision")
+        self._wrap(env, '_calculate_reward', "reward")
+        self._wrap(env, '_get_obs', "observation")
+
+        # Outermost, so the phases above also count when called from step(); time in step()
+        # outside of them is reported as "other"
+        self._wrap_step()
+
+    def uninstall(self):
+        # The wrappers are instance attributes shadowing the class methods
+        for obj, name in reversed(self._installed):
+            delattr(obj, name)
+        self._installed.clear()
+
+    def reset(self):
+        self.totals.clear()
+        self.calls.clear()
+
+    def _wrap(self, obj, name: str, phase: str):
+        method = getattr(obj, name)
+        totals, calls = self.totals, self.calls
+        clock = time.perf_counter_ns
+
+        def timed(*args, **kwargs):
+            start = clock()
+            result = method(*args, **kwargs)
+            totals[phase] += clock() - start
+            calls[phase] += 1
+            return result
+
+        setattr(obj, name, timed)
+        self._installed.append((obj, name))
+
+    def _wrap_step(self):
+        step: Callable = self.env.step
+        totals, calls = self.totals, self.calls
+        clock = time.perf_counter_ns
+
+        def timed_step(action):
+            phases_before = sum(totals.values())
+            start = clock()
+            result = step(action)
+            elapsed = clock() - start
+
+            totals["other"] += elapsed - (sum(totals.values()) - phases_before)
+            calls["other"] += 1
+            totals["step"] += elapsed
+            calls["step"] += 1
+            return result
+
+        self.env.step = timed_step
+        self._installed.append((self.env, 'step'))
+
+    def report(self) -> Dict[str, dict]:
+        """Per phase: calls, total milliseconds, mean microseconds per call and share of step time."""
+        totals, calls = dict(self.totals), dict(self.calls)
+
+        ghost_phases = [phase for phase in totals if phase.startswith("ghosts.")]
+        if ghost_phases:
+            totals["ghosts"] = sum(totals[phase] for phase in ghost_phases)
+            calls["ghosts"] = max(calls[phase] for phase in ghost_phases)
+
+        step_total = totals.get("step", 0)
+        return {
+            phase: {
+                "calls": calls[phase],
+                "total_ms": total / 1e6,
+                "mean_us": total / calls[phase] / 1e3 if calls[phase] else 0.0,
+                "share": total / step_total if step_total else 0.0,
+            }
+            for phase, total in sorted(totals.items())
+        }
+
+    def summary(self) -> str:
+        lines = [f"{'phase':<22} {'calls':>10} {'total ms':>12} {'mean us':>10} {'share':>7}"]
+        for phase, stats in self.report().items():
+            lines.append(
+                f"{phase:<22} {stats['calls']:>10} {stats['total_ms']:>12.1f} {stats['mean_us']:>10.2f} {stats['share']:>7.1%}"
+            )
+        return "\n".join(lines)
+
+def record_profile(logger, report: Dict[str, dict], prefix: str = "profile"):
+    """Records a report's mean microseconds per phase on an SB3 logger, e.g. for TensorBoard."""
+    for phase, stats in report.items():
+        logger.record(f"{prefix}/{phase}_us", stats["mean_us"])